@@ -103,4 +103,171 @@ char* reverse(char* word){
         reverse_word[i] = word[(n - 1) - i];
     }
     return reverse_word;
-}
\ No newline at end of file
+}
+
+typedef struct TrieNodeStruct{
+    unsigned char* keys;
+    int* children;
+    int size;
+    int capacity;
+    int terminal;
+}TrieNode;
+
+typedef struct TrieStruct{
+    TrieNode* nodes;
+    int size;
+    int capacity;
+}Trie;
+
+int trie_new_node(Trie*);
+int trie_insert(Trie*, const char*);
+int trie_walk(Trie*, const char*, int, int, int*);
+int trie_child(Trie*, int, unsigned char);
+
+Trie* compile_trie(char** words, int n){
+    // Creates a byte trie out of an unsorted 2D char array, each word is inserted once
+    Trie* trie = malloc(sizeof(Trie));
+    trie->size = 0;
+    trie->capacity = n + 1;
+    trie->nodes = malloc(sizeof(TrieNode) * trie->capacity);
+    trie_new_node(trie);
+    for(int i = 0; i < n; i++)
+        trie_insert(trie, words[i]);
+    return trie;
+}
+
+int trie_new_node(Trie* trie){
+    // Append an empty node into the node pool and return its index
+    if (trie->size == trie->capacity){
+        trie->capacity *= 2;
+        trie->nodes = realloc(trie->nodes, sizeof(TrieNode) * trie->capacity);
+    }
+    TrieNode node = {NULL, NULL, 0, 0, 0};
+    trie->nodes[trie->size] = node;
+    return trie->size++;
+}
+
+int trie_child(Trie* trie, int index, unsigned char key){
+    // Binary search the sorted keys of a node, return the child index or -1 if it does not exist
+    TrieNode* node = &trie->nodes[index];
+    int low = 0;
+    int high = node->size - 1;
+    while (high >= low) {
+        int mid = low + (high - low) / 2;
+        if (node->keys[mid] == key)
+            return node->children[mid];
+        if (node->keys[mid] > key)
+            high = mid - 1;
+        else
+            low = mid + 1;
+    }
+    return -1;
+}
+
+int trie_insert(Trie* trie, const char* word){
+    // Insert a word into the trie, returns 1 if it was not in the trie before
+    int current = 0;
+    for(const unsigned char* c = (const unsigned char*) word; *c; c++){
+        int child = trie_child(trie, current, *c);
+        if (child == -1){
+            // the node pool may move on realloc, so only hold on to indexes in here
+            child = trie_new_node(trie);
+            TrieNode* node = &trie->nodes[current];
+            if (node->size == node->capacity){
+                node->capacity = node->capacity ? node->capacity * 2 : 2;
+                node->keys = realloc(node->keys, node->capacity);
+                node->children = realloc(node->children, sizeof(int) * node->capacity);
+            }
+            int position = node->size;
+            while (position > 0 && node->keys[position - 1] > *c){
+                node->keys[position] = node->keys[position - 1];
+                node->children[position] = node->children[position - 1];
+                position--;
+            }
+            node->keys[position] = *c;
+            node->children[position] = child;
+            node->size++;
+        }
+        current = child;
+    }
+    int inserted = !trie->nodes[current].terminal;
+    trie->nodes[current].terminal = 1;
+    return inserted;
+}
+
+int trie_remove(Trie* trie, const char* word){
+    // Unmark a word from the trie, returns 1 if it was in the trie. The nodes are kept for the next insert.
+    int current = 0;
+    for(const unsigned char* c = (const unsigned char*) word; *c && current != -1; c++)
+        current = trie_child(trie, current, *c);
+    if (current == -1 || !trie->nodes[current].terminal)
+        return 0;
+    trie->nodes[current].terminal = 0;
+    return 1;
+}
+
+int trie_walk(Trie* trie, const char* text, int length, int step, int* lengths){
+    // Walks text from its first byte by step (1 forward, -1 backward) and stores the length of every word
+    // in the trie that was passed through. Returns the amount of words found.
+    int matches = 0;
+    int current = 0;
+    for(int i = 0; i < length && current != -1; i++){
+        current = trie_child(trie, current, (unsigned char) text[i * step]);
+        if (current != -1 && trie->nodes[current].terminal)
+            lengths[matches++] = i + 1;
+    }
+    return matches;
+}
+
+Result* trie_find_prefix(Trie* trie, const char* content){
+    // Walks the content once and creates a 2D char array of every word in the trie that content starts with.
+    // Longest match comes first, same as multi_find_prefix.
+    int length = strlen(content);
+    int* lengths = malloc(sizeof(int) * (length + 1));
+    int matches = trie_walk(trie, content, length, 1, lengths);
+
+    size_t found = 1;
+    char** found_prefixes = calloc(sizeof(char*), found);
+    while(matches > 0){
+        char* prefix = strndup(content, lengths[--matches]);
+        found_prefixes = append(found_prefixes, &found, prefix);
+        free(prefix);
+    }
+    free(lengths);
+    return compile_result(found_prefixes, found);
+}
+
+Result* trie_find_suffix(Trie* trie, const char* string){
+    // Trie of reversed words, creates a 2D char array of every word in the trie that a word in the string ends with.
+    // Longest match of each word comes first, same as find_commands.
+    int length = strlen(string);
+    int* lengths = malloc(sizeof(int) * (length + 1));
+    size_t found = 1;
+    char** found_cmd = calloc(sizeof(char*), found);
+    int start = 0;
+    while(start < length){
+        int end = start;
+        while(end < length && string[end] != ' ')
+            end++;
+        int matches = end > start ? trie_walk(trie, string + end - 1, end - start, -1, lengths) : 0;
+        while(matches > 0){
+            int size = lengths[--matches];
+            char* command = strndup(string + end - size, size);
+            found_cmd = append(found_cmd, &found, command);
+            free(command);
+        }
+        start = end + 1;
+    }
+    free(lengths);
+    return compile_result(found_cmd, found);
+}
+
+void free_trie(Trie* trie){
+    // Free every node of the trie, then the trie itself
+    for(int i = 0; i < trie->size; i++){
+        free(trie->nodes[i].keys);
+        free(trie->nodes[i].children);
+    }
+    free(trie->nodes);
+    free(trie);
+}
@@ -24,6 +24,14 @@ class Bots(*features):
     async def cog_load(self) -> None:
         self.bot.loop.create_task(self.task_handler())
         self.bot.loop.create_task(self.loading_all_prefixes())
+        self.bot.loop.create_task(self.loading_letter_stats())
+        self.bot.loop.create_task(self.command_rollup.backfill_if_empty())
+        self.ingestion.start()
+        self.letter_buffer.start()
+
+    async def cog_unload(self) -> None:
+        await self.ingestion.close()
+        await self.letter_buffer.close()
 
 
 async def setup(bot: StellaBot) -> None:
@@ -243,11 +243,11 @@ class AddBotHandler(FindBotCog):
     async def botrank(self, ctx: StellaContext, bot: greedy_parser.UntilFlag[BotCommands] = None, *, flags: BotListReverse):
         reverse = flags.reverse
         bots = {x.id: x for x in ctx.guild.members if x.bot}
-        query = "SELECT bot_id, COUNT(command) AS total_usage FROM commands_list " \
+        query = "SELECT bot_id, SUM(usage) AS total_usage FROM commands_rollup " \
                 "WHERE guild_id=$1 AND bot_id=ANY($2::BIGINT[]) " \
                 "GROUP BY bot_id"
         record = await self.bot.pool_pg.fetch(query, ctx.guild.id, list(bots))
-        bot_data = [BotCommands(bots[r["bot_id"]], 0, 0, r["total_usage"]) for r in record]
+        bot_data = [BotCommands(bots[r["bot_id"]], 0, r["total_usage"]) for r in record]
         bot_data.sort(key=lambda x: x.total_usage, reverse=not reverse)
         if not bot:
             menu = InteractionPages(source=all_bot_count(bot_data))
@@ -5,6 +5,13 @@ from typing import TYPE_CHECKING
 
 from discord.ext import commands
 
+from .correlator import BotResponseCorrelator
+from .ingestion import PositionLetterBuffer, PrefixCommandBuffer
+from .letter_stats import LetterPositionStats
+from .rollup import CommandRollup
+from .word_index import GuildWordIndex
+from utils.useful import PrefixTrie, SuffixTrie
+
 if TYPE_CHECKING:
     from main import StellaBot
 
@@ -19,7 +26,10 @@ class FindBotCog(commands.Cog):
         self.re_addbot = re_command + re_bot + re_reason
         self.cached_bots = {}
         self.re_github = re.compile(r'https?://(?:www\.)?github.com/(?P<repo_owner>(\w|-)+)/(?P<repo_name>(\w|-)+)?')
-        self.all_bot_prefixes = {}
-        self.all_bot_commands = {}
-        self.compiled_prefixes = None
-        self.compiled_commands = None
+        self.prefix_index = GuildWordIndex(PrefixTrie)
+        self.command_index = GuildWordIndex(SuffixTrie)
+        self.correlator = BotResponseCorrelator()
+        self.command_rollup = CommandRollup(bot)
+        self.ingestion = PrefixCommandBuffer(bot, rollup=self.command_rollup)
+        self.letter_buffer = PositionLetterBuffer(bot)
+        self.letter_stats = LetterPositionStats()
@@ -12,7 +12,7 @@ import textwrap
 import time
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Type, TypeVar, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
 
 import discord
 
@@ -25,9 +25,10 @@ from .converters import pprefix, clean_prefix
 from .models import BotGitHubLink, BotRepo, BotAdded, BotOwner
 from utils import flags as flg, greedy_parser
 from utils.buttons import InteractionPages, PromptView
+from utils.chart_cache import chart_key
 from utils.decorators import event_check, is_discordpy, pages
 from utils.errors import NotInDatabase
-from utils.image_manipulation import create_bar, get_majority_color, islight, process_image
+from utils.image_manipulation import create_bar
 from utils.new_converters import BotCommands, BotPrefixes, IsBot
 from utils.useful import StellaContext, StellaEmbed, aware_utc, plural, realign
 
@@ -43,26 +44,7 @@ class BotPredictPrefixes:
     @classmethod
     async def convert(cls, ctx: StellaContext, argument: str) -> BotPredictPrefixes:
         user = await IsBot().convert(ctx, argument)
-        query = """
-            SELECT pt.letter, pt.position, pt.count, total, (pt.count::FLOAT) / (total::FLOAT) "percentage"
-            FROM position_letter pt
-            INNER JOIN (
-                SELECT position, MAX(count) as count FROM position_letter
-                WHERE bot_id=$1
-                GROUP BY position
-            ) AS m
-            ON (m.count=pt.count AND pt.position=m.position)
-            INNER JOIN (
-                SELECT position, SUM(count) "total"
-                FROM position_letter
-                WHERE bot_id=$1
-                GROUP BY position
-            ) AS sums
-            ON (sums.position=m.position)
-            WHERE bot_id=$1
-            ORDER BY pt.position
-        """
-        if not (data := await ctx.bot.pool_pg.fetch(query, user.id)):
+        if not (data := await cls.letter_summary(ctx, user.id)):
             raise NotInDatabase(user)
         neural_net = ctx.bot.derivative_prefix_neural
         prefix, raw_data = await neural_net.predict(data, return_raw=True)
@@ -74,6 +56,53 @@ class BotPredictPrefixes:
             )
         return instance
 
+    @classmethod
+    async def from_guild(cls, ctx: StellaContext) -> List[BotPredictPrefixes]:
+        """Predicts every bot in the guild that has letter data in a single neural network batch, bots that could
+           not be predicted confidently are left out."""
+        members = [member for member in ctx.guild.members if member.bot]
+        summaries = await cls.letter_summaries(ctx, [member.id for member in members])
+        bots, datas = [], []
+        for member in members:
+            if data := summaries.get(member.id):
+                bots.append(member)
+                datas.append(data)
+
+        if not datas:
+            return []
+
+        predictions = await ctx.bot.derivative_prefix_neural.predict_many(datas, return_raw=True)
+        return [cls(bot, prefix, raw_data) for bot, (prefix, raw_data) in zip(bots, predictions) if prefix]
+
+    @classmethod
+    async def letter_summary(cls, ctx: StellaContext, bot_id: int) -> Optional[List[Dict[str, Any]]]:
+        return (await cls.letter_summaries(ctx, [bot_id])).get(bot_id)
+
+    @staticmethod
+    async def letter_summaries(ctx: StellaContext, bot_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """Gets the most used letter of each position of every bot from memory, bots without data are left out.
+           The database is only queried when the letter stats are still loading, once for every bot."""
+        if (cog := ctx.bot.get_cog("Bots")) is not None and cog.letter_stats.ready:
+            summaries = {bot_id: cog.letter_stats.summary(bot_id) for bot_id in bot_ids}
+            return {bot_id: summary for bot_id, summary in summaries.items() if summary}
+
+        query = """
+            SELECT pt.bot_id, pt.letter, pt.position, pt.count, total, (pt.count::FLOAT) / (total::FLOAT) "percentage"
+            FROM position_letter pt
+            INNER JOIN (
+                SELECT bot_id, position, MAX(count) as count, SUM(count) "total"
+                FROM position_letter
+                WHERE bot_id=ANY($1::BIGINT[])
+                GROUP BY bot_id, position
+            ) AS m
+            ON (m.bot_id=pt.bot_id AND m.position=pt.position AND m.count=pt.count)
+            ORDER BY pt.bot_id, pt.position
+        """
+        summaries = {}
+        for row in await ctx.bot.pool_pg.fetch(query, bot_ids):
+            summaries.setdefault(row["bot_id"], []).append(row)
+        return summaries
+
 
 class AllPrefixes(ListPageSource):
     """Menu for allprefix command."""
@@ -129,19 +158,13 @@ class BotHandler(FindBotCog):
 
     async def get_all_prefix(self, ctx: StellaContext, prefix: str) -> List[discord.Member]:
         """Quick function that gets the amount of bots that has the same prefix in a server."""
-        sql = "SELECT * FROM prefixes_list WHERE guild_id=$1 AND prefix=$2"
+        sql = "SELECT bot_id FROM prefixes_list WHERE guild_id=$1 AND prefix=$2"
         data = await self.bot.pool_pg.fetch(sql, ctx.guild.id, prefix)
+        if not data:
+            return []
 
-        def mem(x):
-            return ctx.guild.get_member(x)
-
-        bot_list = []
-        for each in [mem(x['bot_id']) for x in data if mem(x['bot_id'])]:
-            bot = await BotPrefixes.convert(ctx, f"{each.id}")
-            if prefix in bot.all_raw_prefixes:
-                bot_list.append(bot)
-
-        return bot_list
+        predictions = await BotPrefixes.from_guild(ctx, [x['bot_id'] for x in data])
+        return [bot for bot in predictions.values() if prefix in bot.all_raw_prefixes]
 
     @commands.command(aliases=["prefixbots", "pbots"],
                       brief="Shows the name of bot(s) have a given prefix.",
@@ -182,8 +205,8 @@ class BotHandler(FindBotCog):
         await ctx.embed(**kwargs)
 
     async def create_bar(self, ctx: StellaContext, bot: Union[discord.Member, discord.User]) -> Optional[discord.File]:
-        query = 'SELECT command, COUNT(command) "usage" ' \
-                'FROM commands_list ' \
+        query = 'SELECT command, SUM(usage) "usage" ' \
+                'FROM commands_rollup ' \
                 'WHERE bot_id=$1 AND guild_id=$2 ' \
                 'GROUP BY command ' \
                 'ORDER BY usage DESC ' \
@@ -201,16 +224,20 @@ class BotHandler(FindBotCog):
                        ylabel="Commands")
 
         asset = bot.display_avatar
-        avatar_bytes = io.BytesIO(await asset.read())
-        color = major = await get_majority_color(avatar_bytes)
-        if not islight(*major.to_rgb()) or bot == ctx.me:
-            color = discord.Color(ctx.bot.color)
 
-        bar = await create_bar(names, usages, str(color), **payload)
-        to_send = await process_image(avatar_bytes, bar)
-        return discord.File(to_send, filename="picture.png")
+        async def render() -> bytes:
+            avatar = await self.bot.avatar_cache.info(asset)
+            color = avatar.chart_color(discord.Color(ctx.bot.color), use_fallback=bot == ctx.me)
+            with await create_bar(names, usages, str(color), **payload) as bar, \
+                    await self.bot.avatar_cache.compose(asset, bar) as to_send:
+                return to_send.getvalue()
+
+        key = chart_key("botinfo", names, usages, payload, asset.key, bot == ctx.me)
+        png = await self.bot.chart_cache.get_or_render(key, render)
+        return discord.File(io.BytesIO(png), filename="picture.png")
 
-    async def format_bot_info(self, ctx, bot: Union[discord.Member, discord.User]) -> discord.Embed:
+    async def format_bot_info(self, ctx, bot: Union[discord.Member, discord.User], *,
+                              prefixes: Optional[Dict[int, BotPrefixes]] = None) -> discord.Embed:
         embed = StellaEmbed.default(ctx, title=str(bot))
         bot_id = str(bot.id)
         embed.add_field(name="ID", value=f"`{bot_id}`")
@@ -226,14 +253,19 @@ class BotHandler(FindBotCog):
                 embed.add_field(name="Requested at", value=aware_utc(value, mode='f'))
             embed.add_field(name="Reason", value=reason, inline=False)
 
-        if val := await handle_convert(BotPrefixes):
+        if prefixes is not None:
+            val = prefixes.get(bot.id)
+        else:
+            val = await handle_convert(BotPrefixes)
+
+        if val:
             allprefixes = ", ".join(map("`{}`".format, [clean_prefix(ctx, v) for v in val.all_raw_prefixes]))
             embed.add_field(name="Bot Prefix", value=allprefixes)
 
         if val := await handle_convert(BotCommands):
             embed.add_field(name="Command Usage", value=f"{val.total_usage:,}")
             high_command = val.highest_command
-            high_amount = len(val.command_usages.get(high_command))
+            high_amount = val.get_command(high_command)
             embed.add_field(name="Top Command", value=f"{high_command}(`{high_amount:,}`)")
 
         if val := await handle_convert(BotRepo):
@@ -323,6 +355,9 @@ class BotHandler(FindBotCog):
         query = "DELETE FROM prefixes_list WHERE guild_id=$1 AND bot_id=$2 AND prefix=$3"
         unique_prefixes = set(prefixes)
         await self.bot.pool_pg.executemany(query, [(ctx.guild.id, bot.bot.id, x) for x in unique_prefixes])
+        for prefix in unique_prefixes:
+            self.prefix_index.discard(ctx.guild.id, bot.bot.id, prefix)
+        self.bot.prefix_predictions.invalidate((ctx.guild.id, bot.bot.id))
         await ctx.confirmed()
 
     @_bot.command(help="Add prefixes into a specific bot for bot owners")
@@ -334,6 +369,9 @@ class BotHandler(FindBotCog):
         max_usage = max([p['usage'] for p in current_prefixes] or [1])
         values = [(guild_id, bot_id, x, max_usage, datetime.datetime.utcnow()) for x in unique_prefixes]
         await self.bot.pool_pg.executemany(query, values)
+        for prefix in unique_prefixes:
+            self.prefix_index.add(guild_id, bot_id, prefix)
+        self.bot.prefix_predictions.invalidate((guild_id, bot_id))
         await ctx.maybe_reply(f"Successfully inserted `{'` `'.join(unique_prefixes)}`")
         await ctx.confirmed()
 
@@ -367,13 +405,18 @@ class BotHandler(FindBotCog):
         if not processed:
             return
 
-        bot_id = message.author.id
-        values = [(bot_id, x.lower(), i, 1) for i, x in enumerate(processed)]
-        sql = "INSERT INTO position_letter VALUES($1, $2, $3, $4) " \
-              "ON CONFLICT(bot_id, letter, position) DO " \
-              "UPDATE SET count = position_letter.count + 1"
+        self.letter_buffer.add(message.author.id, processed)
+        self.letter_stats.add(message.author.id, processed)
 
-        await self.bot.pool_pg.executemany(sql, values)
+    async def loading_letter_stats(self) -> None:
+        """Loads position_letter into memory. Flushing is held off while loading so the counts that are still in
+           the buffer are added exactly once."""
+        await self.bot.wait_until_ready()
+        async with self.letter_buffer.flush_lock:
+            data = await self.bot.pool_pg.fetch("SELECT bot_id, letter, position, count FROM position_letter")
+            self.letter_stats.add_counts(data)
+            self.letter_stats.add_counts((*key, count) for key, count in self.letter_buffer.counter.items())
+            self.letter_stats.ready = True
 
     @commands.command(aliases=["bpd"], help="Uses neural network to predict a bot's prefix.")
     async def botpredict(self, ctx: StellaContext, *, bot: BotPredictPrefixes):
@@ -386,6 +429,23 @@ class BotHandler(FindBotCog):
                f'**Overall Confidence: ** `{summation / len(bot.prefix) * 100:.2f}%`'
         await ctx.embed(title=f"Predicted Prefix for '{bot.bot}'", description=desc)
 
+    @commands.command(aliases=["bpda", "botpredictall"], help="Uses neural network to predict every bot's prefix "
+                                                               "in this server at once.")
+    @commands.guild_only()
+    async def allbotpredict(self, ctx: StellaContext):
+        if not (predictions := await BotPredictPrefixes.from_guild(ctx)):
+            raise commands.CommandError("Looks like i have no data to analyse sry.")
+
+        @pages(per_page=10)
+        async def show_result(_, menu: menus.MenuPages, entry: List[BotPredictPrefixes]) -> discord.Embed:
+            key = "(\u200b|\u200b)"
+            offset = menu.current_page * 10 + 1
+            contents = [f"`{i}. {p.bot} {key} {discord.utils.escape_markdown(p.prefix)}`"
+                        for i, p in enumerate(entry, start=offset)]
+            return discord.Embed(title="Predicted Prefixes", description="\n".join(realign(contents, key)))
+
+        await InteractionPages(show_result(predictions)).start(ctx)
+
     @commands.command(aliases=["ab"], help="Shows the list of all bots in discord.py server and information.")
     @is_discordpy()
     async def allbots(self, ctx: StellaContext):
@@ -464,7 +524,7 @@ class BotHandler(FindBotCog):
                 if url := self.url_store.get(bot.id):
                     embed.set_image(url=url)
                 elif file := await self.cog.create_bar(self.ctx, bot):
-                    url = await self.cog.bot.upload_file(byte=file.fp.read(), filename=file.filename)
+                    url = await self.cog.bot.upload_file(byte=file.fp, filename=file.filename)
                     embed.set_image(url=url)
                     self.url_store.update({bot.id: url})
                 else:
@@ -472,7 +532,9 @@ class BotHandler(FindBotCog):
                     return
                 await interaction.response.edit_message(embed=embed)
 
-        menu = InteractionBots(self, CacheListPageSource(bots, formatter=self.format_bot_info), generate_page=True)
+        # Predicting every prefix at once is cheaper than a query for every page
+        formatter = functools.partial(self.format_bot_info, prefixes=await BotPrefixes.from_guild(ctx))
+        menu = InteractionBots(self, CacheListPageSource(bots, formatter=formatter), generate_page=True)
         await menu.start(ctx)
 
     @commands.command(aliases=["pp", "predictprefixes"], help="Shows how likely a prefix is valid for a bot.")
@@ -40,8 +40,8 @@ class CommandHandler(FindBotCog):
     @commands.command(aliases=['findcommands', 'fc', 'fuck'], help="Finds all bots that has a particular command")
     @commands.guild_only()
     async def findcommand(self, ctx: StellaContext, *, command: str):
-        sql = 'SELECT bot_id, COUNT(command) "counter" ' \
-              'FROM commands_list ' \
+        sql = 'SELECT bot_id, SUM(usage) "counter" ' \
+              'FROM commands_rollup ' \
               'WHERE command LIKE $1 AND guild_id=$2 ' \
               'GROUP BY bot_id ' \
               'ORDER BY counter DESC'
@@ -97,7 +97,7 @@ class CommandHandler(FindBotCog):
         reverse = flags.reverse
         query = "SELECT * FROM " \
                 "   (SELECT command, COUNT(command) AS command_count FROM " \
-                "       (SELECT DISTINCT bot_id, command FROM commands_list " \
+                "       (SELECT DISTINCT bot_id, command FROM commands_rollup " \
                 "       WHERE guild_id=$1 " \
                 "       GROUP BY bot_id, command) AS _ " \
                 "   GROUP BY command) AS _ " \
@@ -138,3 +138,10 @@ class CommandHandler(FindBotCog):
             return embed.set_thumbnail(url=bot.bot.display_avatar)
         menu = InteractionPages(each_page(bot.commands))
         await menu.start(ctx)
+
+    @commands.command(help="Rebuilds the hourly command usage from every command that was recorded.")
+    @commands.is_owner()
+    async def rollupbackfill(self, ctx: StellaContext):
+        async with ctx.typing():
+            rows = await self.command_rollup.backfill()
+        await ctx.maybe_reply(f"Rebuilt `{rows:,}` hourly rows.")
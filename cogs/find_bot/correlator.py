@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import collections
+import datetime
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple, Union
+
+import discord
+
+ReactRespond = collections.namedtuple("ReactRespond", "created_at author reference")
+Responded = Union[discord.Message, ReactRespond]
+
+
+@dataclass
+class CorrelatorStats:
+    opened: int = 0
+    events: int = 0
+    routed: int = 0
+    dispatch_total: float = 0
+
+    @property
+    def average_dispatch(self) -> float:
+        return self.dispatch_total / (self.events or 1)
+
+
+class ListeningWindow:
+    """Collects the bots that responded to a message within the duration. Bots that respond after a user has
+       responded are only collected when they reply to the message."""
+    def __init__(self, message: discord.Message, check: Callable[[discord.Message], bool], *, duration: float = 5):
+        self.message = message
+        self.check = check
+        self.expires_at = message.created_at + datetime.timedelta(seconds=duration)
+        self.bots: Dict[int, Responded] = {}
+        self.after_user: Dict[int, Responded] = {}
+        self.flip = False
+
+    def feed(self, responded: Responded) -> None:
+        if any(responded.author.id in respondance for respondance in (self.bots, self.after_user)):
+            return
+
+        self.flip |= not responded.author.bot
+        if not responded.author.bot:
+            return
+
+        if not self.flip:
+            self.bots.update({responded.author.id: responded})
+        elif getattr(responded.reference, "cached_message", None) == self.message:
+            self.after_user.update({responded.author.id: responded})
+
+
+class BotResponseCorrelator:
+    """Keeps every open ListeningWindow indexed by channel id and message id, each message or reaction event is
+       routed only to the windows of its own channel instead of every window checking every event."""
+    def __init__(self):
+        self.channels: Dict[int, List[ListeningWindow]] = {}
+        self.messages: Dict[int, List[ListeningWindow]] = {}
+        self.stats = CorrelatorStats()
+
+    @property
+    def open_windows(self) -> int:
+        return sum(len(windows) for windows in self.channels.values())
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} open_windows={self.open_windows} opened={self.stats.opened} " \
+               f"events={self.stats.events} routed={self.stats.routed} " \
+               f"average_dispatch={self.stats.average_dispatch * 1e6:.2f}µs>"
+
+    async def listen(self, message: discord.Message, check: Callable[[discord.Message], bool], *,
+                     duration: float = 5) -> Tuple[Dict[int, Responded], Dict[int, Responded]]:
+        """Opens a window on the message's channel until it expires, then returns the bots that responded before
+           and after a user responded."""
+        window = ListeningWindow(message, check, duration=duration)
+        channel_windows = self.channels.setdefault(message.channel.id, [])
+        message_windows = self.messages.setdefault(message.id, [])
+        channel_windows.append(window)
+        message_windows.append(window)
+        self.stats.opened += 1
+        try:
+            await discord.utils.sleep_until(window.expires_at)
+        finally:
+            for key, mapping, windows in ((message.channel.id, self.channels, channel_windows),
+                                          (message.id, self.messages, message_windows)):
+                windows.remove(window)
+                if not windows:
+                    mapping.pop(key, None)
+
+        return window.bots, window.after_user
+
+    def dispatch_message(self, message: discord.Message) -> None:
+        if not (windows := self.channels.get(message.channel.id)):
+            return
+
+        start = time.perf_counter()
+        for window in windows:
+            # the window can be opened before this listener receives the message that opened it
+            if message.id > window.message.id and window.check(message):
+                window.feed(message)
+                self.stats.routed += 1
+
+        self.stats.events += 1
+        self.stats.dispatch_total += time.perf_counter() - start
+
+    def dispatch_reaction(self, reaction: discord.Reaction, user: Union[discord.Member, discord.User]) -> None:
+        if not (windows := self.messages.get(reaction.message.id)):
+            return
+
+        start = time.perf_counter()
+        for window in windows:
+            window.feed(ReactRespond(datetime.datetime.utcnow(), user, None))
+            self.stats.routed += 1
+
+        self.stats.events += 1
+        self.stats.dispatch_total += time.perf_counter() - start
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import collections
+import datetime
+import itertools
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+from utils.buffers import WriteBehindBuffer
+
+if TYPE_CHECKING:
+    from .rollup import CommandRollup
+
+PrefixKey = Tuple[int, int, str]
+PrefixRow = Tuple[int, int, str, int, datetime.datetime]
+CommandRow = Tuple[int, int, str, datetime.datetime]
+
+
+class PrefixCommandBuffer(WriteBehindBuffer):
+    """Write behind buffer for commands_list and prefixes_list. Commands are copied straight into commands_list and
+       counted into commands_rollup, prefixes of the same guild, bot and prefix are merged into a single row before
+       being copied into a staging table that is upserted into prefixes_list in one statement."""
+    STAGING_QUERY = "CREATE TEMPORARY TABLE IF NOT EXISTS prefixes_staging " \
+                    "(LIKE prefixes_list INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+    MERGE_QUERY = "INSERT INTO prefixes_list SELECT * FROM prefixes_staging " \
+                  "ON CONFLICT (guild_id, bot_id, prefix) DO " \
+                  "UPDATE SET usage=prefixes_list.usage + EXCLUDED.usage, " \
+                  "last_usage=GREATEST(prefixes_list.last_usage, EXCLUDED.last_usage)"
+
+    def __init__(self, *args, rollup: CommandRollup, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rollup = rollup
+        self.prefixes: Dict[PrefixKey, List] = {}
+        self.commands: List[CommandRow] = []
+
+    def __len__(self) -> int:
+        return len(self.prefixes) + len(self.commands)
+
+    def add(self, prefix_list: Iterable[PrefixRow], command_list: Iterable[CommandRow]) -> None:
+        self.merge_prefixes(self.prefixes, ((key, (usage, last_usage)) for *key, usage, last_usage in prefix_list))
+        self.commands.extend(command_list)
+        self.notify()
+
+    @staticmethod
+    def merge_prefixes(prefixes: Dict[PrefixKey, List],
+                       values: Iterable[Tuple[Iterable, Tuple[int, datetime.datetime]]]) -> None:
+        for key, (usage, last_usage) in values:
+            key = tuple(key)
+            if (current := prefixes.get(key)) is None:
+                prefixes[key] = [usage, last_usage]
+            else:
+                current[0] += usage
+                current[1] = max(current[1], last_usage)
+
+    def take(self) -> Tuple[Dict[PrefixKey, List], List[CommandRow]]:
+        data = self.prefixes, self.commands
+        self.prefixes, self.commands = {}, []
+        return data
+
+    def restore(self, data: Tuple[Dict[PrefixKey, List], List[CommandRow]]) -> None:
+        prefixes, commands = data
+        # the failed rows are older, they go first so drop_oldest removes them first
+        self.merge_prefixes(prefixes, self.prefixes.items())
+        self.prefixes = prefixes
+        self.commands[:0] = commands
+
+    def drop_oldest(self, amount: int) -> int:
+        # commands are kept in the order they were used, prefixes in the order they were first merged
+        dropped = min(amount, len(self.commands))
+        del self.commands[:dropped]
+        for key in [*itertools.islice(self.prefixes, amount - dropped)]:
+            del self.prefixes[key]
+            dropped += 1
+        return dropped
+
+    async def write(self, data: Tuple[Dict[PrefixKey, List], List[CommandRow]]) -> None:
+        prefixes, commands = data
+        async with self.bot.pool_pg.acquire() as conn, conn.transaction():
+            if commands:
+                await conn.copy_records_to_table("commands_list", records=commands)
+                await self.rollup.write(conn, commands)
+            if prefixes:
+                await conn.execute(self.STAGING_QUERY)
+                records = [(*key, usage, last_usage) for key, (usage, last_usage) in prefixes.items()]
+                await conn.copy_records_to_table("prefixes_staging", records=records)
+                await conn.execute(self.MERGE_QUERY)
+
+        # A prediction made between the add and this flush read the old rows, it must not outlive the flush
+        for guild_id, bot_id in {key[:2] for key in prefixes}:
+            self.bot.prefix_predictions.invalidate((guild_id, bot_id))
+
+
+class PositionLetterBuffer(WriteBehindBuffer):
+    """Counts the letters of each position that triggered a bot in memory, then upserts every count into
+       position_letter with a single unnest statement on each flush."""
+    UPSERT_QUERY = "INSERT INTO position_letter " \
+                   "SELECT * FROM UNNEST($1::BIGINT[], $2::CHAR[], $3::INT[], $4::INT[]) " \
+                   "ON CONFLICT(bot_id, letter, position) DO " \
+                   "UPDATE SET count = position_letter.count + EXCLUDED.count"
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("interval", 10)
+        kwargs.setdefault("size", 5000)
+        super().__init__(*args, **kwargs)
+        self.counter: collections.Counter[Tuple[int, str, int]] = collections.Counter()
+
+    def __len__(self) -> int:
+        return len(self.counter)
+
+    def add(self, bot_id: int, content: str) -> None:
+        self.counter.update((bot_id, letter.lower(), i) for i, letter in enumerate(content))
+        self.notify()
+
+    def take(self) -> collections.Counter[Tuple[int, str, int]]:
+        data, self.counter = self.counter, collections.Counter()
+        return data
+
+    def restore(self, data: collections.Counter[Tuple[int, str, int]]) -> None:
+        self.counter.update(data)
+
+    async def write(self, data: collections.Counter[Tuple[int, str, int]]) -> None:
+        bot_ids, letters, positions = zip(*data)
+        await self.bot.pool_pg.execute(self.UPSERT_QUERY, bot_ids, letters, positions, [*data.values()])
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+LetterSummary = Dict[str, Union[str, int, float]]
+
+
+class BotLetterStats:
+    """Letter counts of each position for a single bot, the most used letter of each position and the total
+       of each position are kept up to date on every increment."""
+    __slots__ = ("counts", "totals", "best")
+
+    def __init__(self, size: int):
+        self.counts: List[Dict[str, int]] = [{} for _ in range(size)]
+        self.totals: List[int] = [0] * size
+        self.best: List[Tuple[str, int]] = [("", 0)] * size
+
+    def add(self, letter: str, position: int, amount: int = 1) -> None:
+        counts = self.counts[position]
+        count = counts[letter] = counts.get(letter, 0) + amount
+        self.totals[position] += amount
+        if count > self.best[position][1]:
+            self.best[position] = (letter, count)
+
+    def summary(self) -> List[LetterSummary]:
+        """Same rows as the position_letter MAX/SUM query, one row for each position that has data."""
+        return [{"letter": letter, "position": position, "count": count, "total": total, "percentage": count / total}
+                for position, ((letter, count), total) in enumerate(zip(self.best, self.totals)) if total]
+
+
+class LetterPositionStats:
+    """In memory copy of position_letter for every bot, so predictions never needs to aggregate the table."""
+    def __init__(self, size: int = 30):
+        self.size = size
+        self.bots: Dict[int, BotLetterStats] = {}
+        self.ready = False
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} ready={self.ready} bots={len(self.bots)}>"
+
+    def add_counts(self, values: Iterable[Tuple[int, str, int, int]]) -> None:
+        """Adds (bot_id, letter, position, count) rows."""
+        for bot_id, letter, position, count in values:
+            if position >= self.size:
+                continue
+            if (stats := self.bots.get(bot_id)) is None:
+                self.bots[bot_id] = stats = BotLetterStats(self.size)
+            stats.add(letter, position, count)
+
+    def add(self, bot_id: int, content: str) -> None:
+        if self.ready:
+            self.add_counts((bot_id, letter.lower(), i, 1) for i, letter in enumerate(content))
+
+    def summary(self, bot_id: int) -> Optional[List[LetterSummary]]:
+        if (stats := self.bots.get(bot_id)) is not None:
+            return stats.summary()
@@ -1,96 +1,53 @@
 from __future__ import annotations
 
-import asyncio
-import collections
-import contextlib
 import ctypes
-import datetime
 import itertools
 import re
 import textwrap
-from typing import Callable, Union, Dict, Tuple, Coroutine, Any, List, Optional
+from typing import Callable, Union, Dict, Tuple, List, Optional
 
 import discord
 from discord.ext import commands
 
 from .baseclass import FindBotCog
+from .correlator import ReactRespond
 from .decorators import is_user, deco_event
 from utils.decorators import listen_for_guilds, wait_ready, event_check
-from utils.useful import compile_array, search_commands, search_prefixes
-
-ReactRespond = collections.namedtuple("ReactRespond", "created_at author reference")
+from utils.useful import PrefixTrie, search_commands, search_prefixes
 
 
 def prefix_cache_ready() -> deco_event:
     """Event check for command_count"""
     def predicate(self, message: discord.Message) -> bool:
-        return self.compiled_prefixes and self.compiled_commands and not message.author.bot
+        return self.prefix_index and self.command_index and not message.author.bot
     return event_check(predicate)
 
 
 class PrefixCommandListeners(FindBotCog):
     async def loading_all_prefixes(self) -> None:
-        """Loads all unique prefix when it loads and set compiled_pref for C code."""
+        """Loads all unique prefix when it loads and build the prefix/command index for C code."""
         await self.bot.wait_until_ready()
-        prefix_data = await self.bot.pool_pg.fetch("SELECT DISTINCT bot_id, prefix FROM prefixes_list")
-        commands_data = await self.bot.pool_pg.fetch("SELECT DISTINCT bot_id, command FROM commands_list")
-        for prefix, command in itertools.zip_longest(prefix_data, commands_data):
-            if prefix:
-                prefix_list = self.all_bot_prefixes.setdefault(prefix["bot_id"], set())
-                prefix_list.add(prefix["prefix"])
-            if command:
-                command_list = self.all_bot_commands.setdefault(command["bot_id"], set())
-                command_list.add(command["command"])
-        self.update_compile()
-
-    def update_compile(self) -> None:
-        temp = [*{prefix for prefix_list in self.all_bot_prefixes.values() for prefix in prefix_list}]
-        cmds = [*{command for command_list in self.all_bot_commands.values() for command in command_list}]
-        self.compiled_prefixes = compile_array(sorted(temp))
-        self.compiled_commands = compile_array(sorted(x[::-1] for x in cmds))
+        prefix_data = await self.bot.pool_pg.fetch("SELECT DISTINCT guild_id, bot_id, prefix FROM prefixes_list")
+        commands_data = await self.bot.pool_pg.fetch("SELECT DISTINCT guild_id, bot_id, command FROM commands_list")
+        self.prefix_index.rebuild(prefix_data)
+        self.command_index.rebuild(commands_data)
 
     async def listen_for_bots_at(self, message: discord.Message, message_check: Callable[[discord.Message], bool]) -> \
             Tuple[Dict[int, Union[discord.Message, ReactRespond]], Dict[int, Union[discord.Message, ReactRespond]]]:
         """Listens for bots responding and terminating when a user respond"""
-        bots = {}
-        after_user = {}
-        time_to_listen = message.created_at + datetime.timedelta(seconds=5)
-        flip = 0
-
-        def reaction_add_check(reaction: discord.Reaction, _: discord.User) -> bool:
-            return reaction.message == message
-
-        stuff_here = locals()
-        with contextlib.suppress(asyncio.TimeoutError):
-            while time_to_listen > (time_rn := discord.utils.utcnow()):
-                time_left = (time_to_listen - time_rn).total_seconds()
-                done, didnt = await asyncio.wait(
-                    [self.bot.wait_for(event, check=stuff_here[f"{event}_check"], timeout=time_left)
-                     for event in ("reaction_add", "message")],
-                    return_when=asyncio.FIRST_COMPLETED
-                )
-                for coro in done:
-                    coro.exception()
-
-                responded = done.pop().result()
-                if isinstance(responded, tuple):
-                    responded = ReactRespond(datetime.datetime.utcnow(), responded[1], None)
-
-                for coro in didnt:
-                    coro.cancel()
-
-                if any(responded.author.id in respondance for respondance in (bots, after_user)):
-                    continue
-                flip |= not responded.author.bot
-                if not responded.author.bot:
-                    continue
-
-                if not flip:
-                    bots.update({responded.author.id: responded})
-                elif getattr(responded.reference, "cached_message", None) == message:
-                    after_user.update({responded.author.id: responded})
-
-        return bots, after_user
+        return await self.correlator.listen(message, message_check)
+
+    @commands.Cog.listener("on_message")
+    @wait_ready()
+    async def correlate_message(self, message: discord.Message):
+        """Routes the message to the listening windows that are open in its channel."""
+        self.correlator.dispatch_message(message)
+
+    @commands.Cog.listener("on_reaction_add")
+    @wait_ready()
+    async def correlate_reaction(self, reaction: discord.Reaction, user: Union[discord.Member, discord.User]):
+        """Routes the reaction to the listening windows of the reacted message."""
+        self.correlator.dispatch_reaction(reaction, user)
 
     async def update_prefix_bot(self, message: discord.Message, func: Callable[[discord.Message], bool],
                                 prefix: str, command: str) -> None:
@@ -107,13 +64,11 @@ class PrefixCommandListeners(FindBotCog):
             return
 
         message_sent.update(after)
-        bots_responded = list(message_sent)
         # Possibility of duplication removal
-        exist_query = "SELECT * FROM prefixes_list WHERE guild_id=$1 AND bot_id=ANY($2::BIGINT[])"
-        existing = await self.bot.pool_pg.fetch(exist_query, message.guild.id, bots_responded)
-        for x in existing:
-            if prefix.startswith(x["prefix"]) and x["bot_id"] in bots_responded:
-                message_sent.pop(x["bot_id"], None)
+        if guild_index := self.prefix_index.get(message.guild.id):
+            for bot_id in list(message_sent):
+                if any(prefix.startswith(existing) for existing in guild_index.get(bot_id)):
+                    message_sent.pop(bot_id)
 
         if not message_sent:
             return
@@ -125,15 +80,11 @@ class PrefixCommandListeners(FindBotCog):
 
         await self.insert_both_prefix_command(prefix_list, command_list)
 
-        for _, x, prefix, _, _ in prefix_list:
-            prefix_list = self.all_bot_prefixes.setdefault(x, set())
-            prefix_list.add(prefix)
-
-        for _, bot, command, _ in command_list:
-            command_list = self.all_bot_commands.setdefault(bot, set())
-            command_list.add(command)
+        for guild_id, x, prefix, _, _ in prefix_list:
+            self.prefix_index.add(guild_id, x, prefix)
 
-        self.update_compile()
+        for guild_id, bot, command, _ in command_list:
+            self.command_index.add(guild_id, bot, command)
 
     @commands.Cog.listener("on_message")
     @wait_ready()
@@ -173,16 +124,18 @@ class PrefixCommandListeners(FindBotCog):
 
     async def search_respond(
             self,
-            callback: Callable[[Tuple[ctypes.c_char_p, int], ctypes.c_char_p], Coroutine[Any, Any, List[str]]],
+            callback: Callable[[PrefixTrie, ctypes.c_char_p], List[str]],
             message: discord.Message, word: str, _type: str
-    ) -> Optional[Tuple[filter, List[str], Dict[int, discord.Message]]]:
+    ) -> Optional[Tuple[List[Dict[str, Union[int, str]]], List[str], Dict[int, discord.Message]]]:
         """Gets the prefix/command that are in this message, gets the bot that responded
-           and return them."""
-        content_compiled = ctypes.create_string_buffer(word.encode("utf-8"))
-        if not (result := await callback(getattr(self, f"compiled_{_type}"), content_compiled)):
+           and return them. Only the prefix/command of bots in the message's guild are matched."""
+        singular = _type[:len(_type) - ((_type != "commands") + 1)]
+        if not (index := getattr(self, f"{singular}_index").get(message.guild.id)):
             return
 
-        singular = _type[:len(_type) - ((_type != "commands") + 1)]
+        content_compiled = ctypes.create_string_buffer(word.encode("utf-8"))
+        if not (result := callback(index.trie, content_compiled)):
+            return
 
         def check(msg):
             return msg.channel == message.channel
@@ -192,22 +145,16 @@ class PrefixCommandListeners(FindBotCog):
             return
 
         bot_found.update(after)
-        bot_found_keys = list(bot_found)
-        query = f"SELECT DISTINCT bot_id, {singular} FROM {_type}_list " \
-                f"WHERE guild_id=$1 AND bot_id=ANY($2::BIGINT[]) AND {singular}=ANY($3::VARCHAR[])"
-        bots = await self.bot.pool_pg.fetch(query, message.guild.id, bot_found_keys, result)
-        responded = filter(lambda x: x["bot_id"] in bot_found, bots)
+        responded = [{"bot_id": bot_id, singular: found}
+                     for found in result for bot_id in index.bots_for(found) if bot_id in bot_found]
         return responded, result, bot_found
 
     async def insert_both_prefix_command(self, prefix_list: List[Union[int, str]],
                                          command_list: List[Union[int, str]]) -> None:
-        command_list_query = "INSERT INTO commands_list VALUES($1, $2, $3, $4)"
-        prefix_list_query = "INSERT INTO prefixes_list VALUES($1, $2, $3, $4, $5) " \
-                            "ON CONFLICT (guild_id, bot_id, prefix) DO " \
-                            "UPDATE SET usage=prefixes_list.usage + 1, last_usage=$5"
-
-        for key in "command_list", "prefix_list":
-            await self.bot.pool_pg.executemany(locals()[f"{key}_query"], locals()[key])
+        """Queues the rows into the ingestion buffer, they are written in bulk on its next flush."""
+        self.ingestion.add(prefix_list, command_list)
+        for guild_id, bot_id in {(guild_id, bot_id) for guild_id, bot_id, *_ in prefix_list}:
+            self.bot.prefix_predictions.invalidate((guild_id, bot_id))
 
     # @commands.Cog.listener("on_message")
     # @wait_ready()
@@ -225,7 +172,7 @@ class PrefixCommandListeners(FindBotCog):
         responded, result, message_sent = received
         prefixes_values = []
         commands_values = []
-        exist_query = "SELECT * FROM prefixes_list WHERE guild_id=$1 AND bot_id=$2"
+        guild_prefixes = self.prefix_index.get(message.guild.id)
         for command, bot in itertools.product(result, responded):
             if bot["command"] == command:
                 bot_id = bot['bot_id']
@@ -233,19 +180,17 @@ class PrefixCommandListeners(FindBotCog):
                 target = re.escape(command)
                 if (match := re.match("(?P<prefix>^.{{1,100}}?(?={}))".format(target), word, re.I)) and len(
                         match["prefix"]) < 31:
-                    existing = await self.bot.pool_pg.fetch(exist_query, message.guild.id, bot_id)
+                    existing = guild_prefixes.get(bot_id) if guild_prefixes else set()
                     prefix = match["prefix"]
-                    if any(x['prefix'] != prefix and prefix.startswith(x["prefix"]) for x in existing):
+                    if any(x != prefix and prefix.startswith(x) for x in existing):
                         continue
                     prefixes_values.append((message.guild.id, bot_id, prefix, 1, message_respond))
 
                 if message.content.casefold().startswith(command):
                     commands_values.append((message.guild.id, bot_id, command, message_respond))
 
-        for _, bot, prefix, _, _ in prefixes_values:
-            prefixes = self.all_bot_prefixes.setdefault(bot, set())
-            prefixes.add(prefix)
-        self.update_compile()
+        for guild_id, bot, prefix, _, _ in prefixes_values:
+            self.prefix_index.add(guild_id, bot, prefix)
 
         await self.insert_both_prefix_command(prefixes_values, commands_values)
 
@@ -275,9 +220,7 @@ class PrefixCommandListeners(FindBotCog):
                 if got_command:
                     commands_values.append((message.guild.id, bot_id, got_command, message_respond))
 
-        for _, bot, command, _ in commands_values:
-            command_list = self.all_bot_commands.setdefault(bot, set())
-            command_list.add(command)
-        self.update_compile()
+        for guild_id, bot, command, _ in commands_values:
+            self.command_index.add(guild_id, bot, command)
 
         await self.insert_both_prefix_command(prefixes_values, commands_values)
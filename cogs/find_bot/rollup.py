@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import collections
+import datetime
+import logging
+from typing import TYPE_CHECKING, Iterable, Optional, Tuple
+
+import asyncpg
+
+from utils.useful import print_exception
+
+if TYPE_CHECKING:
+    from main import StellaBot
+
+RollupKey = Tuple[int, int, str, datetime.datetime]
+CommandRow = Tuple[int, int, str, Optional[datetime.datetime]]
+# commands_list.time_used is nullable, those commands are counted in this hour so totals still include them
+UNKNOWN_HOUR = datetime.datetime(1970, 1, 1)
+
+log = logging.getLogger(__name__)
+
+
+class CommandRollup:
+    """Keeps commands_rollup, the usage of every command per bot per guild per hour, in sync with commands_list.
+       Rows are added in the same transaction as the commands_list copy, so analytics commands can read from the
+       rollup instead of scanning every invocation."""
+    UPSERT_QUERY = "INSERT INTO commands_rollup " \
+                   "SELECT * FROM UNNEST($1::BIGINT[], $2::BIGINT[], $3::VARCHAR[], $4::TIMESTAMP[], $5::INT[]) " \
+                   "ON CONFLICT (guild_id, bot_id, command, hour) DO " \
+                   "UPDATE SET usage = commands_rollup.usage + EXCLUDED.usage"
+    BACKFILL_QUERY = "INSERT INTO commands_rollup " \
+                     "SELECT guild_id, bot_id, command, " \
+                     "COALESCE(DATE_TRUNC('hour', time_used), 'epoch'::TIMESTAMP), COUNT(*) " \
+                     "FROM commands_list " \
+                     "GROUP BY 1, 2, 3, 4"
+
+    def __init__(self, bot: StellaBot):
+        self.bot = bot
+
+    @staticmethod
+    def hour_of(time_used: Optional[datetime.datetime]) -> datetime.datetime:
+        if time_used is None:
+            return UNKNOWN_HOUR
+        return time_used.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def aggregate(cls, commands: Iterable[CommandRow]) -> collections.Counter[RollupKey]:
+        return collections.Counter((guild_id, bot_id, command, cls.hour_of(time_used))
+                                   for guild_id, bot_id, command, time_used in commands)
+
+    async def write(self, conn: asyncpg.Connection, commands: Iterable[CommandRow]) -> None:
+        """Adds the commands into the rollup, this should be called in the transaction that inserts them."""
+        if not (counter := self.aggregate(commands)):
+            return
+
+        guild_ids, bot_ids, names, hours = zip(*counter)
+        await conn.execute(self.UPSERT_QUERY, guild_ids, bot_ids, names, hours, [*counter.values()])
+
+    async def backfill(self) -> int:
+        """Rebuilds commands_rollup from commands_list. commands_list is locked against writes while this runs, the
+           ingestion buffer simply waits, so no command is counted twice or missed."""
+        async with self.bot.pool_pg.acquire() as conn, conn.transaction():
+            await conn.execute("LOCK TABLE commands_list IN SHARE MODE")
+            await conn.execute("TRUNCATE commands_rollup")
+            status = await conn.execute(self.BACKFILL_QUERY)
+        return int(status.split()[-1])
+
+    async def backfill_if_empty(self) -> None:
+        """Backfills the rollup the first time it is used on a database that already has commands."""
+        try:
+            if await self.bot.pool_pg.fetchval("SELECT EXISTS(SELECT 1 FROM commands_rollup)"):
+                return
+            rows = await self.backfill()
+            log.info("Backfilled %s rows into commands_rollup", rows)
+        except Exception as e:
+            print_exception("Failure to backfill commands_rollup:", e)
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set, Tuple, Type
+
+from utils.useful import PrefixTrie
+
+
+@dataclass
+class IndexTimings:
+    rebuilds: int = 0
+    last_rebuild: float = 0
+    inserts: int = 0
+    insert_total: float = 0
+    removals: int = 0
+    removal_total: float = 0
+
+    @property
+    def average_insert(self) -> float:
+        return self.insert_total / (self.inserts or 1)
+
+    @property
+    def average_removal(self) -> float:
+        return self.removal_total / (self.removals or 1)
+
+    def __str__(self) -> str:
+        return f"rebuilds={self.rebuilds} last_rebuild={self.last_rebuild * 1e3:.2f}ms " \
+               f"inserts={self.inserts} average_insert={self.average_insert * 1e6:.2f}µs " \
+               f"removals={self.removals} average_removal={self.average_removal * 1e6:.2f}µs"
+
+
+class BotWordIndex:
+    """Keeps the words (prefixes or commands) of every bot in a trie that is updated on each insert and removal,
+       rather than flattening and sorting every word again. A word stays searchable until no bot has it."""
+    def __init__(self, trie_cls: Type[PrefixTrie]):
+        self.trie_cls = trie_cls
+        self.trie = trie_cls()
+        self.bot_words: Dict[int, Set[str]] = {}
+        self.word_bots: Dict[str, Set[int]] = {}
+        self.timings = IndexTimings()
+
+    def __len__(self) -> int:
+        return len(self.trie)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} words={len(self)} bots={len(self.bot_words)} {self.timings}>"
+
+    def get(self, bot_id: int) -> Set[str]:
+        return self.bot_words.get(bot_id, set())
+
+    def bots_for(self, word: str) -> Set[int]:
+        return self.word_bots.get(word, set())
+
+    def rebuild(self, values: Iterable[Tuple[int, str]]) -> None:
+        """Replaces everything in the index with the given (bot_id, word) pairs."""
+        start = time.perf_counter()
+        bot_words, word_bots = {}, {}
+        for bot_id, word in values:
+            bot_words.setdefault(bot_id, set()).add(word)
+            word_bots.setdefault(word, set()).add(bot_id)
+
+        self.bot_words, self.word_bots = bot_words, word_bots
+        self.trie = self.trie_cls(word_bots)
+        self.timings.rebuilds += 1
+        self.timings.last_rebuild = time.perf_counter() - start
+
+    def add(self, bot_id: int, word: str) -> bool:
+        """Adds a word to a bot, returns True when the word was not known for any bot."""
+        start = time.perf_counter()
+        self.bot_words.setdefault(bot_id, set()).add(word)
+        bots = self.word_bots.setdefault(word, set())
+        bots.add(bot_id)
+        inserted = len(bots) == 1 and self.trie.insert(word)
+        self.timings.inserts += 1
+        self.timings.insert_total += time.perf_counter() - start
+        return inserted
+
+    def discard(self, bot_id: int, word: str) -> bool:
+        """Removes a word from a bot, returns True when no bot has the word anymore."""
+        start = time.perf_counter()
+        if (words := self.bot_words.get(bot_id)) is not None:
+            words.discard(word)
+            if not words:
+                del self.bot_words[bot_id]
+
+        removed = False
+        if (bots := self.word_bots.get(word)) is not None:
+            bots.discard(bot_id)
+            if not bots:
+                del self.word_bots[word]
+                removed = self.trie.remove(word)
+
+        self.timings.removals += 1
+        self.timings.removal_total += time.perf_counter() - start
+        return removed
+
+
+class GuildWordIndex:
+    """BotWordIndex for each guild, a message is only matched against the words of the bots in its own guild and
+       the bots that own a matched word are known without asking the database."""
+    def __init__(self, trie_cls: Type[PrefixTrie]):
+        self.trie_cls = trie_cls
+        self.guilds: Dict[int, BotWordIndex] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.guilds)
+
+    def __repr__(self) -> str:
+        words = sum(len(index) for index in self.guilds.values())
+        return f"<{self.__class__.__name__} guilds={len(self.guilds)} words={words}>"
+
+    def get(self, guild_id: int) -> Optional[BotWordIndex]:
+        return self.guilds.get(guild_id)
+
+    def rebuild(self, values: Iterable[Tuple[int, int, str]]) -> None:
+        """Replaces everything in the index with the given (guild_id, bot_id, word) rows."""
+        guild_values: Dict[int, Set[Tuple[int, str]]] = {}
+        for guild_id, bot_id, word in values:
+            guild_values.setdefault(guild_id, set()).add((bot_id, word))
+
+        guilds = {}
+        for guild_id, pairs in guild_values.items():
+            guilds[guild_id] = index = BotWordIndex(self.trie_cls)
+            index.rebuild(pairs)
+        self.guilds = guilds
+
+    def add(self, guild_id: int, bot_id: int, word: str) -> bool:
+        if (index := self.guilds.get(guild_id)) is None:
+            self.guilds[guild_id] = index = BotWordIndex(self.trie_cls)
+        return index.add(bot_id, word)
+
+    def discard(self, guild_id: int, bot_id: int, word: str) -> bool:
+        if (index := self.guilds.get(guild_id)) is None:
+            return False
+        return index.discard(bot_id, word)
@@ -5,7 +5,12 @@ import aiohttp
 import discord
 from discord.ext import commands
 
+from utils.useful import print_exception
 from .button_ui import ButtonGame
+from .click_engine import ClickEngine
+from .click_retention import ClickRetention
+from .wordle_board import tile_atlas
+from .wordle_dictionary import WordleDictionaries
 
 if TYPE_CHECKING:
     from main import StellaBot
@@ -14,15 +19,26 @@ if TYPE_CHECKING:
 class BaseGameCog(commands.Cog):
     def __init__(self, bot: StellaBot):
         self.bot = bot
-        self.lewdle_query = "SELECT word FROM wordle_word WHERE tag='lewdle' AND LENGTH(word) = $1"
         self.button_rank_cache: Dict[int, discord.User] = {}
         self.http_rather: Optional[aiohttp.ClientSession] = None
+        self.click_engine = ClickEngine(bot)
+        self.click_retention = ClickRetention(bot)
+        self.wordle_dictionaries = WordleDictionaries(bot)
 
     async def cog_load(self) -> None:
         self.http_rather = aiohttp.ClientSession()
+        self.click_engine.start()
+        self.click_retention.start()
+        try:
+            await self.bot.loop.run_in_executor(None, tile_atlas.build)
+        except Exception as e:
+            # the atlas renders a missing tile the first time it's asked for, boards still work without the build
+            print_exception("Failure to build the wordle tile atlas, tiles are rendered on first use:", e)
         if not self.bot.tester:
-            self.bot.add_view(ButtonGame())
+            self.bot.add_view(ButtonGame(self.click_engine))
 
     async def cog_unload(self) -> None:
         if self.http_rather:
             await self.http_rather.close()
+        self.click_retention.stop()
+        await self.click_engine.close()
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import datetime
-import io
 from typing import Union, Optional, Literal
 
 import discord
@@ -11,9 +10,11 @@ from discord.ext.commands import Author
 
 from cogs.games.baseclass import BaseGameCog
 from cogs.games.button_ui import ButtonGame, UserUnknown
+from cogs.games.click_retention import PER_MINUTE_QUERY
 from utils.buttons import InteractionPages
 from utils.decorators import pages
-from utils.image_manipulation import get_majority_color, islight, create_graph, process_image
+from utils.image_manipulation import create_graph
+from utils.timeseries import bin_times
 from utils.useful import StellaContext, realign
 
 
@@ -24,7 +25,7 @@ class ButtonCommandCog(BaseGameCog):
         await ctx.embed(
             title="Click It",
             description="**How to play this game?**\nPress the button, the end.",
-            view=ButtonGame()
+            view=ButtonGame(self.click_engine)
         )
 
     async def get_or_fetch_user(self, user_id: int):
@@ -42,18 +43,8 @@ class ButtonCommandCog(BaseGameCog):
     @click.command(name="rank", aliases=["ranks", "top"],
                    help="Shows top 10 of the leaderboard for the click game.")
     async def click_rank(self, ctx: StellaContext):
-        query = "SELECT * " \
-                "FROM (" \
-                "   SELECT  user_id, " \
-                "           amount," \
-                "           ROW_NUMBER() OVER (ORDER BY amount DESC) as rn" \
-                "   FROM button_game" \
-                "   GROUP BY user_id" \
-                ") sorted_table " \
-                "LIMIT 10"
-
-        results = await self.bot.pool_pg.fetch(query)
-        values = [(await self.get_or_fetch_user(c['user_id']), c['amount']) for c in results]
+        await self.click_engine.wait_loaded()
+        values = [(await self.get_or_fetch_user(user_id), amount) for user_id, amount in self.click_engine.top(10)]
         key = "\u200b"
         contents = [f"`{i}. {x} {key} {a}`" for i, (x, a) in enumerate(values, start=1)]
         await ctx.embed(
@@ -62,89 +53,59 @@ class ButtonCommandCog(BaseGameCog):
         )
 
     @click.command(name="stat", aliases=["statistic", "s", "statistics", "stats"],
-                   help="Creates a graph that represents the user's click rate over the last 2 days.")
-    async def click_stat(self, ctx: StellaContext, accurate: Optional[Literal['accurate']], *, member: Union[discord.Member, discord.User] = Author):
+                   help="Creates a graph that represents the user's click rate over the last 2 days. The amount of "
+                        "points on the graph can be given between 3 and 100, defaults to 10.")
+    async def click_stat(self, ctx: StellaContext, accurate: Optional[Literal['accurate']],
+                         bins: Optional[commands.Range[int, 3, 100]] = 10, *,
+                         member: Union[discord.Member, discord.User] = Author):
         # copy pasted code from code above cause stella is lazy
         time_rn = discord.utils.utcnow()
         time_given = time_rn - datetime.timedelta(days=2)
-        query = "SELECT * FROM click_game_logger " \
-                "WHERE click_time > $1 " \
-                "AND user_id=$2"
-
-        data = await self.bot.pool_pg.fetch(query, time_given, member.id)
+        data = await self.bot.pool_pg.fetch(PER_MINUTE_QUERY, time_given, member.id)
         if not data:
             raise commands.CommandError(f'No data for "{member}" found in the last 2 days.')
 
-        bot_based_time = {}
-        total_seconds = (time_rn - time_given).total_seconds()
-        each_time = datetime.timedelta(seconds=total_seconds / 10)
-        for each in range(10):
-            within_time = []
-            after = time_rn - each_time * each
-            before = time_rn - each_time * (each + 1)
-            for row in data:
-                if before < row["click_time"] < after:
-                    within_time.append(row)
-
-            bot_based_time.update({before: len(within_time)})
-
-        x = list(bot_based_time)
-        y = list(bot_based_time.values())
+        x, y = bin_times([row["minute"] for row in data], time_given, time_rn, bins=bins,
+                         weights=[row["amount"] for row in data])
 
         asset = member.display_avatar
         async with ctx.typing():
-            avatar_bytes = io.BytesIO(await asset.read())
-            new_color = major = await get_majority_color(avatar_bytes)
-            if not islight(*major.to_rgb()) or member == ctx.me:
-                new_color = discord.Color(ctx.bot.color)
-
+            avatar = await self.bot.avatar_cache.info(asset)
+            new_color = avatar.chart_color(discord.Color(ctx.bot.color), use_fallback=member == ctx.me)
             graph = await create_graph(x, y, color=new_color, smooth=accurate is None)
-            to_send = await process_image(avatar_bytes, graph)
+            to_send = await self.bot.avatar_cache.compose(asset, graph)
         embed = discord.Embed()
         embed.set_image(url="attachment://picture.png")
         embed.set_author(name=member, icon_url=asset)
         await ctx.embed(embed=embed, file=discord.File(to_send, filename="picture.png"))
         graph.close()
-        avatar_bytes.close()
         to_send.close()
 
         del graph
-        del avatar_bytes
         del to_send
 
+    @click.command(help="Partitions the click log by day, so old clicks can be compacted by dropping a partition.")
+    @commands.is_owner()
+    async def partition(self, ctx: StellaContext):
+        async with ctx.typing():
+            await self.click_retention.partition_table()
+            await self.click_retention.compact()
+        await ctx.confirmed()
+
     @click.command(aliases=["analyse", "analysis", "analyzes", "analyses"])
     @commands.is_owner()
     async def analyze(self, ctx: StellaContext, *, user: Union[discord.Member, discord.User] = None):
-        single_coef = """
-        SELECT ((STDDEV(a.amount) / AVG(a.amount)) * 100) "cof" FROM (
-            SELECT DATE_TRUNC('minute', click_time) "time", COUNT(*) "amount"
-            FROM  click_game_logger
-            WHERE CURRENT_TIMESTAMP - INTERVAL '1 day' < click_time
-            AND user_id={}
-            GROUP BY time
-            HAVING COUNT(click_time) <> 0
-            ORDER BY time DESC
-        ) a
+        # coefficient of variation of the clicks per minute over the last day, one pass over the per minute rows
+        query = f"""
+        SELECT  user_id,
+                SUM(amount) "total",
+                (STDDEV(amount) FILTER (WHERE minute > $3) / AVG(amount) FILTER (WHERE minute > $3)) * 100 "coef value"
+        FROM ({PER_MINUTE_QUERY}) per_minute
+        GROUP BY user_id
+        ORDER BY total DESC
         """
-        all_coef_query = f"""SELECT d.user_id, (
-            SELECT COUNT(*) FROM click_game_logger WHERE user_id=d.user_id
-        ) "total", (
-            {single_coef.format("d.user_id")}
-            FETCH FIRST 1 ROW ONLY
-        ) "coef value"
-        FROM (
-            SELECT DISTINCT user_id
-            FROM click_game_logger
-        ) d"""
-        user_coef = single_coef.format("$1")
-        if user:
-            query = user_coef
-            values = user.id,
-        else:
-            query = all_coef_query
-            values = ()
-
-        fetched = await self.bot.pool_pg.fetch(query, *values)
+        last_day = discord.utils.utcnow() - datetime.timedelta(days=1)
+        fetched = await self.bot.pool_pg.fetch(query, None, getattr(user, "id", None), last_day)
 
         @pages(per_page=10)
         async def tabulation(self, menu, entries):
@@ -11,10 +11,12 @@ import discord
 import humanize
 from discord.ext import commands
 
+from utils.errors import ClickGameLoading
 from utils.useful import plural
 
 if TYPE_CHECKING:
     from main import StellaBot
+    from .click_engine import ClickEngine
 
 
 @dataclass
@@ -28,13 +30,23 @@ class CooldownUser:
 
 
 class ButtonGame(discord.ui.View):
-    def __init__(self):
+    def __init__(self, engine: ClickEngine):
         super().__init__(timeout=None)
+        self.engine = engine
         self.cooldown_update_message = commands.CooldownMapping.from_cooldown(2, 5, commands.BucketType.channel)
         self.cooldown_for_random = commands.CooldownMapping.from_cooldown(10, 180, commands.BucketType.channel)
 
     subscript = "⁰¹²³⁴⁵⁶⁷⁸⁹"
 
+    async def on_error(self, interaction: discord.Interaction, error: Exception, item: discord.ui.Item) -> None:
+        if not isinstance(error, ClickGameLoading):
+            return await super().on_error(interaction, error, item)
+
+        if interaction.response.is_done():
+            await interaction.followup.send(str(error), ephemeral=True)
+        else:
+            await interaction.response.send_message(str(error), ephemeral=True)
+
     @staticmethod
     def to_subscript(value: int) -> str:
         mapped = [string.digits.index(s) for s in str(value)]
@@ -72,17 +84,14 @@ class ButtonGame(discord.ui.View):
 
     @discord.ui.button(emoji='🖱️', label="Click", custom_id="click_game:click", style=discord.ButtonStyle.success)
     async def on_click_click(self, interaction: discord.Interaction, button: discord.ui.Button):
-        query = "INSERT INTO button_game VALUES($1) " \
-                "ON CONFLICT(user_id) " \
-                "DO UPDATE SET amount = button_game.amount + 1 " \
-                "RETURNING *"
         client: StellaBot = interaction.client
-        author = interaction.user.id
-        values = await client.pool_pg.fetchrow(query, author)
+        # nothing is deferred here, the interaction must be answered within 3 seconds, on_error answers the timeout
+        await self.engine.wait_loaded(timeout=2)
+        amount = self.engine.click(interaction.user.id)
         message = interaction.message or await interaction.original_message()
         embed, *_ = message.embeds
         seconds = embed.description.splitlines()[:2]
-        form_list = f"\n{self.set_user_desc(interaction, embed.description, values['amount'])}"
+        form_list = f"\n{self.set_user_desc(interaction, embed.description, amount)}"
         embed.description = "\n".join(seconds) + form_list
         obj = CooldownUser.from_interaction(interaction)
         per_channel = self.cooldown_update_message.update_rate_limit(obj)
@@ -94,8 +103,6 @@ class ButtonGame(discord.ui.View):
                 if self.cooldown_for_random.update_rate_limit(obj):
                     self.randomize_pos(obj)
                 await interaction.response.defer()
-
-        await client.pool_pg.execute("INSERT INTO click_game_logger VALUES($1)", author)
         # Dont respond
 
     def randomize_pos(self, obj: CooldownUser):
@@ -112,23 +119,14 @@ class ButtonGame(discord.ui.View):
     @discord.ui.button(label="Click Amount", custom_id="click_game:amount")
     async def on_amount_click(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer(thinking=True, ephemeral=True)
-        query = "SELECT * " \
-                "FROM (" \
-                "   SELECT  user_id, " \
-                "           amount," \
-                "           ROW_NUMBER() OVER (ORDER BY amount DESC) as rn" \
-                "   FROM button_game" \
-                "   GROUP BY user_id" \
-                ") sorted_table " \
-                "WHERE user_id = $1"
-
-        value = await interaction.client.pool_pg.fetchrow(query, interaction.user.id)
-        if value is None:
+        await self.engine.wait_loaded()
+        if (value := self.engine.rank(interaction.user.id)) is None:
             await interaction.followup.send("You have no rank")
             return
 
-        clicks = plural("click(s)", amount := value['amount'])
-        await interaction.followup.send(f"You're rank {humanize.ordinal(value['rn'])} with `{amount}` {clicks}")
+        rank, amount = value
+        clicks = plural("click(s)", amount)
+        await interaction.followup.send(f"You're rank {humanize.ordinal(rank)} with `{amount}` {clicks}")
 
 
 class UserUnknown(discord.Object):
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import collections
+import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from utils.buffers import WriteBehindBuffer
+from utils.errors import ClickGameLoading
+from utils.useful import print_exception
+
+ClickRow = Tuple[int, datetime.datetime]
+
+
+class ClickLeaderboard:
+    """Click amount of every user, kept in a list sorted by amount so a rank is a binary search away.
+       The order is the same as ROW_NUMBER() OVER (ORDER BY amount DESC), ties are ordered by user id."""
+    def __init__(self):
+        self.amounts: Dict[int, int] = {}
+        self._order: List[Tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def get(self, user_id: int) -> Optional[int]:
+        return self.amounts.get(user_id)
+
+    def set(self, user_id: int, amount: int) -> None:
+        if (current := self.amounts.get(user_id)) is not None:
+            del self._order[bisect.bisect_left(self._order, (-current, user_id))]
+        self.amounts[user_id] = amount
+        bisect.insort(self._order, (-amount, user_id))
+
+    def increment(self, user_id: int, amount: int = 1) -> int:
+        self.set(user_id, total := self.amounts.get(user_id, 0) + amount)
+        return total
+
+    def rank(self, user_id: int) -> Optional[int]:
+        if (amount := self.amounts.get(user_id)) is None:
+            return None
+        return bisect.bisect_left(self._order, (-amount, user_id)) + 1
+
+    def top(self, amount: int = 10) -> List[Tuple[int, int]]:
+        """Returns (user_id, amount) of the highest users."""
+        return [(user_id, -negative) for negative, user_id in self._order[:amount]]
+
+
+class ClickEngine(WriteBehindBuffer):
+    """Counts clicks of the click game in memory. Totals and the click log are flushed into button_game and
+       click_game_logger in bulk, while the leaderboard answers every rank from memory.
+
+       The click log is a ring buffer of capacity rows, so a database outage can't grow it forever. Clicks that
+       falls off the ring are counted in dropped, their totals are still kept."""
+    UPSERT_QUERY = "INSERT INTO button_game SELECT * FROM UNNEST($1::BIGINT[], $2::BIGINT[]) " \
+                   "ON CONFLICT(user_id) DO UPDATE SET amount = button_game.amount + EXCLUDED.amount"
+
+    def __init__(self, *args, capacity: int = 100_000, **kwargs):
+        kwargs.setdefault("interval", 1)
+        kwargs.setdefault("size", 1000)
+        super().__init__(*args, **kwargs)
+        self.leaderboard = ClickLeaderboard()
+        self.pending: collections.Counter[int] = collections.Counter()
+        self.clicks: Deque[ClickRow] = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.loaded = asyncio.Event()
+        self._load_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.pending) + len(self.clicks)
+
+    def start(self) -> None:
+        super().start()
+        if self._load_task is None:
+            self._load_task = asyncio.create_task(self.load())
+
+    async def load(self, *, retry_after: float = 5, max_retry_after: float = 300) -> None:
+        """Loads button_game into the leaderboard, retrying with a backoff until it succeeds. Nothing is flushed
+           while the query runs, so clicks made before loading are added on top of the stored amounts exactly
+           once."""
+        while True:
+            try:
+                async with self.flush_lock:
+                    data = await self.bot.pool_pg.fetch("SELECT user_id, amount FROM button_game")
+                    for row in data:
+                        self.leaderboard.set(row["user_id"], row["amount"] + self.pending[row["user_id"]])
+                    self.loaded.set()
+                return
+            except Exception as e:
+                print_exception(f"Failure to load the click game leaderboard, retrying in {retry_after}s:", e)
+                await asyncio.sleep(retry_after)
+                retry_after = min(retry_after * 2, max_retry_after)
+
+    async def close(self) -> None:
+        """Stops loading and flushes what is buffered, the upsert adds on top of the stored amounts so this is
+           safe even when the leaderboard never loaded."""
+        if self._load_task is not None:
+            self._load_task.cancel()
+            self._load_task = None
+        await super().close()
+
+    async def wait_loaded(self, timeout: float = 10) -> None:
+        """Waits for the leaderboard to load, raises ClickGameLoading when it doesn't load within timeout."""
+        try:
+            await asyncio.wait_for(self.loaded.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise ClickGameLoading() from None
+
+    def click(self, user_id: int) -> int:
+        """Records a click and returns the new amount of the user."""
+        amount = self.leaderboard.increment(user_id)
+        self.pending[user_id] += 1
+        self.append_clicks([(user_id, discord.utils.utcnow())])
+        self.notify()
+        return amount
+
+    def append_clicks(self, rows: Iterable[ClickRow]) -> None:
+        for row in rows:
+            if len(self.clicks) == self.clicks.maxlen:
+                self.dropped += 1
+            self.clicks.append(row)
+
+    def rank(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """Returns (rank, amount) of a user, or None when the user never clicked."""
+        if (rank := self.leaderboard.rank(user_id)) is None:
+            return None
+        return rank, self.leaderboard.get(user_id)
+
+    def top(self, amount: int = 10) -> List[Tuple[int, int]]:
+        return self.leaderboard.top(amount)
+
+    def take(self) -> Tuple[collections.Counter[int], List[ClickRow]]:
+        data = self.pending, [*self.clicks]
+        self.pending = collections.Counter()
+        self.clicks.clear()
+        return data
+
+    def restore(self, data: Tuple[collections.Counter[int], List[ClickRow]]) -> None:
+        pending, clicks = data
+        self.pending.update(pending)
+        newer = [*self.clicks]
+        self.clicks.clear()
+        self.append_clicks(clicks)
+        self.append_clicks(newer)
+
+    async def write(self, data: Tuple[collections.Counter[int], List[ClickRow]]) -> None:
+        pending, clicks = data
+        async with self.bot.pool_pg.acquire() as conn, conn.transaction():
+            if pending:
+                await conn.execute(self.UPSERT_QUERY, [*pending], [*pending.values()])
+            if clicks:
+                await conn.copy_records_to_table("click_game_logger", records=clicks, columns=["user_id", "click_time"])
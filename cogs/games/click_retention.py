@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import TYPE_CHECKING, List, Optional
+
+import asyncpg
+import discord
+
+from utils.useful import print_exception
+
+if TYPE_CHECKING:
+    from main import StellaBot
+
+# Clicks per minute after $1 of every user or only the user $2, both can be NULL. Compacted minutes lives in
+# click_game_minutes, the recent ones are still raw rows in click_game_logger, a minute is never in both since
+# compaction moves whole minutes at once.
+PER_MINUTE_QUERY = """
+    SELECT user_id, minute, SUM(amount) "amount" FROM (
+        SELECT user_id, minute, amount
+        FROM click_game_minutes
+        WHERE ($1::TIMESTAMPTZ IS NULL OR minute > $1) AND ($2::BIGINT IS NULL OR user_id=$2)
+        UNION ALL
+        SELECT user_id, DATE_TRUNC('minute', click_time), COUNT(*)
+        FROM click_game_logger
+        WHERE ($1::TIMESTAMPTZ IS NULL OR click_time > $1) AND ($2::BIGINT IS NULL OR user_id=$2)
+        GROUP BY 1, 2
+    ) per_minute
+    GROUP BY user_id, minute
+"""
+
+
+class ClickRetention:
+    """Keeps click_game_logger small. Raw clicks older than retention are compacted into per minute counts in
+       click_game_minutes. When click_game_logger is partitioned by day, whole days are compacted and their
+       partition dropped, which is far cheaper than deleting rows."""
+    AGGREGATE = "SELECT user_id, DATE_TRUNC('minute', click_time), COUNT(*) FROM {0} {1} GROUP BY 1, 2 " \
+                "ON CONFLICT (user_id, minute) DO UPDATE SET amount = click_game_minutes.amount + EXCLUDED.amount"
+    COMPACT_QUERY = "WITH moved AS (DELETE FROM click_game_logger WHERE click_time < $1 RETURNING *) " \
+                    "INSERT INTO click_game_minutes " + AGGREGATE.format("moved", "")
+    PARTITION_PREFIX = "click_game_logger_p"
+
+    def __init__(self, bot: StellaBot, *, retention: datetime.timedelta = datetime.timedelta(days=2),
+                 interval: datetime.timedelta = datetime.timedelta(hours=1)):
+        self.bot = bot
+        self.retention = retention
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.compact_loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def compact_loop(self) -> None:
+        while True:
+            try:
+                await self.compact()
+            except Exception as e:
+                print_exception("Error while compacting click_game_logger:", e)
+            await asyncio.sleep(self.interval.total_seconds())
+
+    def cutoff(self) -> datetime.datetime:
+        """Whole minute so a minute is never split between raw and compacted rows."""
+        return (discord.utils.utcnow() - self.retention).replace(second=0, microsecond=0)
+
+    @classmethod
+    def partition_name(cls, day: datetime.date) -> str:
+        return f"{cls.PARTITION_PREFIX}{day:%Y%m%d}"
+
+    @staticmethod
+    async def is_partitioned(conn: asyncpg.Connection) -> bool:
+        query = "SELECT EXISTS(SELECT 1 FROM pg_partitioned_table WHERE partrelid='click_game_logger'::REGCLASS)"
+        return await conn.fetchval(query)
+
+    async def partitions(self, conn: asyncpg.Connection) -> List[str]:
+        query = "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid=i.inhrelid " \
+                "WHERE i.inhparent='click_game_logger'::REGCLASS AND c.relname LIKE $1 " \
+                "ORDER BY c.relname"
+        return [r["relname"] for r in await conn.fetch(query, self.PARTITION_PREFIX + "%")]
+
+    async def ensure_partitions(self, conn: asyncpg.Connection, *, days_ahead: int = 2) -> None:
+        """Creates the partition of every retained day up to days_ahead. A day that fails is logged and the next
+           days are still created."""
+        existing = set(await self.partitions(conn))
+        today = discord.utils.utcnow().date()
+        first = self.cutoff().date()
+        for offset in range((today - first).days + days_ahead + 1):
+            day = first + datetime.timedelta(days=offset)
+            if (name := self.partition_name(day)) in existing:
+                continue
+            try:
+                # a savepoint when partition_table already opened a transaction
+                async with conn.transaction():
+                    await self.create_partition(conn, name, day)
+            except Exception as e:
+                print_exception(f"Failure to create the click_game_logger partition {name}:", e)
+
+    @staticmethod
+    async def create_partition(conn: asyncpg.Connection, name: str, day: datetime.date) -> None:
+        """Attaching a partition fails when the default partition has rows in its range, which happens once a day
+           had no partition while clicks came in. Those rows are moved into the new partition before attaching."""
+        start = datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+        end = start + datetime.timedelta(days=1)
+        await conn.execute(f"CREATE TABLE {name} (LIKE click_game_logger INCLUDING DEFAULTS)")
+        await conn.execute(f"WITH moved AS (DELETE FROM click_game_logger_default "
+                           f"WHERE click_time >= $1 AND click_time < $2 RETURNING *) "
+                           f"INSERT INTO {name} SELECT * FROM moved", start, end)
+        await conn.execute(f"ALTER TABLE click_game_logger ATTACH PARTITION {name} "
+                           f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')")
+
+    async def compact(self) -> int:
+        """Moves every raw click older than the cutoff into click_game_minutes. Returns the amount of minute rows
+           that were written."""
+        cutoff = self.cutoff()
+        written = 0
+        async with self.bot.pool_pg.acquire() as conn:
+            if partitioned := await self.is_partitioned(conn):
+                for name in await self.partitions(conn):
+                    day = datetime.datetime.strptime(name[len(self.PARTITION_PREFIX):], "%Y%m%d")
+                    if day.replace(tzinfo=datetime.timezone.utc) + datetime.timedelta(days=1) > cutoff:
+                        continue
+                    async with conn.transaction():
+                        status = await conn.execute("INSERT INTO click_game_minutes " + self.AGGREGATE.format(name, ""))
+                        await conn.execute(f"DROP TABLE {name}")
+                    written += int(status.split()[-1])
+
+            # rows of the partition that is partly old, or of the default partition
+            status = await conn.execute(self.COMPACT_QUERY, cutoff)
+            written += int(status.split()[-1])
+            if partitioned:
+                await self.ensure_partitions(conn)
+        return written
+
+    async def partition_table(self) -> None:
+        """Converts click_game_logger into a table partitioned by day. Clicks older than the cutoff are compacted
+           on the way, so only the retained days are copied."""
+        cutoff = self.cutoff()
+        async with self.bot.pool_pg.acquire() as conn, conn.transaction():
+            if await self.is_partitioned(conn):
+                return
+
+            await conn.execute("LOCK TABLE click_game_logger IN ACCESS EXCLUSIVE MODE")
+            await conn.execute("ALTER TABLE click_game_logger RENAME TO click_game_logger_old")
+            await conn.execute("CREATE TABLE click_game_logger (LIKE click_game_logger_old INCLUDING DEFAULTS) "
+                               "PARTITION BY RANGE (click_time)")
+            await conn.execute("CREATE TABLE click_game_logger_default PARTITION OF click_game_logger DEFAULT")
+            await self.ensure_partitions(conn)
+            await conn.execute("INSERT INTO click_game_minutes " +
+                               self.AGGREGATE.format("click_game_logger_old", "WHERE click_time < $1"), cutoff)
+            await conn.execute("INSERT INTO click_game_logger "
+                               "SELECT * FROM click_game_logger_old WHERE click_time >= $1", cutoff)
+            await conn.execute("DROP TABLE click_game_logger_old")
@@ -257,14 +257,14 @@ class EitherIOView(discord.ui.View):
             embed.add_field(name="You answered", value=getattr(question, f"option_{question.answered}"))
             if question.answered_image_url is None:
                 byte = await self.io.render_answered_question(question)
-                file = await self.ctx.bot.upload_file(byte=byte.read(), filename="Question.png")
+                file = await self.ctx.bot.upload_file(byte=byte, filename="Question.png")
                 url = question.answered_image_url = file.url
             else:
                 url = question.answered_image_url
         else:
             if question.unanswered_image_url is None:
                 byte = await self.io.render_not_answer_question(question)
-                file = await self.ctx.bot.upload_file(byte=byte.read(), filename="Question.png")
+                file = await self.ctx.bot.upload_file(byte=byte, filename="Question.png")
                 url = question.unanswered_image_url = file.url
             else:
                 url = question.unanswered_image_url
@@ -290,7 +290,7 @@ class EitherIOView(discord.ui.View):
         embed = self.form_embed()
         question.answered = answer
         byte = await self.io.render_answered_question(self.question)
-        file = await self.ctx.bot.upload_file(byte=byte.read(), filename="answered.png")
+        file = await self.ctx.bot.upload_file(byte=byte, filename="answered.png")
         question.answered_image_url = file.url
         embed.set_image(url=file.url)
         embed.add_field(name="You answered", value=getattr(question, f"option_{answer}"))
@@ -9,19 +9,17 @@ import datetime
 import io
 import itertools
 import json
-import random
-from enum import Enum
 from typing import Generator, Optional, List, Dict, TYPE_CHECKING, Union, Any
 
 import discord
-from PIL import ImageDraw, ImageFont
-from PIL import Image
 from discord import TextStyle
 from discord.ext import commands
 from discord.ext.commands import Greedy
 from discord.ui import TextInput
 
 from cogs.games.baseclass import BaseGameCog
+from cogs.games.wordle_board import Letter, LetterKind, render_board
+from cogs.games.wordle_dictionary import WordleDictionary
 from utils import flags as flg
 from utils.buttons import BaseView, QueueView, InteractionPages
 from utils.decorators import in_executor, pages
@@ -34,36 +32,6 @@ from utils.useful import StellaContext, StellaEmbed, plural, aware_utc, unpack
 if TYPE_CHECKING:
     from main import StellaBot
 
-BOX_SIZE = 50
-MARGIN_BOX = 5
-PADDING = 50
-BACKGROUND_COLOR = 18, 18, 19
-
-
-class LetterKind(Enum):
-    correct: discord.Color = discord.Color(0x538d4e)
-    half_correct: discord.Color = discord.Color(0xb59f3b)
-    incorrect: discord.Color = discord.Color(0x39393c)
-
-
-def create_block(draw, x, y, color):
-    draw.rectangle((x, y, x + BOX_SIZE, y + BOX_SIZE), fill=color, outline=(58, 58, 60))
-
-
-@dataclasses.dataclass
-class Letter:
-    char: str
-    kind: LetterKind
-
-    def render_letter(self, draw: ImageDraw, x1: int, y1: int):
-        create_block(draw, x1, y1, self.kind.value.to_rgb())
-        font = ImageFont.truetype("fonts/arialbd.ttf", 40)
-        x2, y2 = draw.textsize(self.char, font=font)
-        x = x1 + ((BOX_SIZE - x2) / 2)
-        y = y1 - (MARGIN_BOX / 2) + ((BOX_SIZE - y2) / 2)  # for some reason i need to subtract 2
-        draw.text((x, y), self.char, (255, 255, 255), font=font)
-
-
 class WordleUnavailable(commands.CommandError):
     def __init__(self):
         super().__init__("Lewdle is unavailable.")
@@ -80,7 +48,7 @@ class WordleNotDictionary(commands.CommandError):
 
 
 class WordleGame:
-    def __init__(self, ctx: StellaContext, *, dictionaries,
+    def __init__(self, ctx: StellaContext, *, dictionary: WordleDictionary,
                  name: str = "wordle",
                  player: Optional[discord.Member] = None,
                  answer: Optional[str] = None,
@@ -88,13 +56,13 @@ class WordleGame:
                  display_answer: bool = True):
 
         self.name = name
-        self.dictionaries = dictionaries
+        self.dictionary = dictionary
         self.ctx: StellaContext = ctx
         self.player = player or ctx.author
         self.word_length: int = word_length
         self.display: List[Optional[Letter]] = [[None] * word_length for _ in range(tries)]
         self.max_tries: int = tries
-        self.answer: str = answer or random.choice(dictionaries)
+        self.answer: str = answer or dictionary.random_word()
         self.user_tries: Optional[int] = None
         self.message: Optional[discord.Message] = None
         self._word_guessed: Optional[asyncio.Future] = None
@@ -102,8 +70,6 @@ class WordleGame:
         self.win: bool = False
         self.finish: bool = False
         self.task: Optional[asyncio.Task] = None
-        self._background: Optional[Image] = None
-        self._background_draw: Optional[ImageDraw] = None
         self.display_answer: bool = display_answer
         self._previous_url: Optional[str] = None
 
@@ -146,7 +112,7 @@ class WordleGame:
         if len(guess) != self.word_length:  # kinda useless ngl, but hey in case people steal it lol
             raise WordleNotEnough(guess.casefold(), self.word_length)
 
-        if guess not in self.dictionaries:
+        if guess not in self.dictionary:
             raise WordleNotDictionary(guess.casefold())
 
         self.display[self.user_tries] = self.convert_guess(guess)
@@ -209,58 +175,13 @@ class WordleGame:
         if not self.finish:
             self.stop()
 
-    def render_background(self):
-        x = (BOX_SIZE + (MARGIN_BOX * 2)) * self.word_length + PADDING * 2
-        y = (BOX_SIZE + (MARGIN_BOX * 2)) * self.max_tries + PADDING * 2
-        self._background = Image.new("RGB", (x, y), BACKGROUND_COLOR)
-        self._background_draw = ImageDraw.Draw(self._background)
-        next_box_x = PADDING
-        next_box_y = PADDING
-        for tries in self.display:
-            next_box_y += MARGIN_BOX
-            original_x = next_box_x
-            for _ in tries:
-                next_box_x += MARGIN_BOX
-                create_block(self._background_draw, next_box_x, next_box_y, BACKGROUND_COLOR)
-                next_box_x += BOX_SIZE + MARGIN_BOX
-
-            next_box_x = original_x
-            next_box_y += BOX_SIZE + MARGIN_BOX
-
-        return self._background
-
-    def get_background(self):
-        if self._background is None:
-            return self.render_background()
-        return self._background
-
     async def render_display(self):
         byte = await self._render_display()
-        return await self.ctx.bot.upload_file(byte=byte.read(), filename="lewdle_board.png")
+        return await self.ctx.bot.upload_file(byte=byte, filename="lewdle_board.png")
 
     @in_executor()
-    def _render_display(self):
-        self.__render_display()
-        byte = io.BytesIO()
-        self._background.save(byte, format="PNG")
-        byte.seek(0)
-        return byte
-
-    def __render_display(self):
-        background = self.get_background()
-        if self.user_tries == 0:
-            return
-
-        self._background_draw = ImageDraw.Draw(background)
-        row = self.user_tries - 1
-        x_axis = PADDING
-        y_axis = PADDING + MARGIN_BOX + ((BOX_SIZE + MARGIN_BOX * 2) * row)
-        for char in self.display[row]:
-            if char is None:
-                return  # something went wrong
-            x_axis += MARGIN_BOX
-            char.render_letter(self._background_draw, x_axis, y_axis)
-            x_axis += BOX_SIZE + MARGIN_BOX
+    def _render_display(self) -> io.BytesIO:
+        return render_board(self.display[:self.user_tries], self.word_length, self.max_tries)
 
     async def forfeit(self):
         message = f"`{self.player}` has forfeited after {self.user_tries} {plural('attempt(s)', self.user_tries)}."
@@ -535,14 +456,14 @@ class DuelView(discord.ui.View):
 
 
 class MultiWordle:
-    def __init__(self, ctx: StellaContext, *players: discord.Member, dictionaries, tries, word_count):
+    def __init__(self, ctx: StellaContext, *players: discord.Member, dictionary: WordleDictionary, tries, word_count):
         self.ctx = ctx
         self.tries = tries
         self.word_count = word_count
-        self.dictionaries = dictionaries
+        self.dictionary = dictionary
         self.players = players
         self.games: Dict[int, WordleGame] = {}
-        self.answer = random.choice(self.dictionaries)
+        self.answer = dictionary.random_word()
         self.loop = ctx.bot.loop
         self._result = ctx.bot.loop.create_future()
         self.amount_finished = 0
@@ -553,7 +474,7 @@ class MultiWordle:
             self._result.set_result(None)
 
     async def every_player(self, player: discord.Member):
-        game = WordleGame(self.ctx, dictionaries=self.dictionaries, player=player, answer=self.answer,
+        game = WordleGame(self.ctx, dictionary=self.dictionary, player=player, answer=self.answer,
                           display_answer=False,
                           word_length=self.word_count,
                           tries=self.tries)
@@ -642,15 +563,18 @@ class QueueWordle(QueueView):
 class WordleCommandCog(BaseGameCog):
     @commands.group(invoke_without_command=True, help="A wordle game except it's lewd.")
     async def lewdle(self, ctx: StellaContext, *, flags: WordleFlag):
-        records = [r[0] for r in await self.bot.pool_pg.fetch(self.lewdle_query, flags.word_count)]
-        if not records:
+        if not (dictionary := await self.wordle_dictionaries.get("lewdle", flags.word_count)):
             raise commands.CommandError(f"Looks like we dont have words for lewdle in {flags.word_count} word count. Try 5.")
 
-        game = WordleGame(ctx, name="Lewdle", dictionaries=records, tries=flags.tries)
+        game = WordleGame(ctx, name="Lewdle", dictionary=dictionary, tries=flags.tries, word_length=dictionary.length)
         await game.start()
 
     @lewdle.command(help="Duel lewdle game with your friends! Who ever guess the word first wins!")
     async def duel(self, ctx: StellaContext, member: discord.Member):
+        # checked before inviting, so nobody accepts a duel that can't start
+        if not (dictionary := await self.wordle_dictionaries.get("lewdle", 5)):
+            raise commands.CommandError("Looks like we dont have words for lewdle in 5 word count.")
+
         value = await ctx.confirmation(
             f"{member.mention}, `{ctx.author}` has invited you to a lewdle duel. Do you accept?",
             to_respond=member
@@ -658,8 +582,7 @@ class WordleCommandCog(BaseGameCog):
         if not value:
             raise commands.CommandError(f"Looks like `{member}` declined. Sorry {ctx.author.mention}.")
 
-        records = [r[0] for r in await self.bot.pool_pg.fetch(self.lewdle_query, 5)]
-        games = MultiWordle(ctx, ctx.author, member, dictionaries=records, word_count=5, tries=6)
+        games = MultiWordle(ctx, ctx.author, member, dictionary=dictionary, word_count=5, tries=6)
         await games.start()
 
     @commands.group(invoke_without_command=True,
@@ -667,13 +590,10 @@ class WordleCommandCog(BaseGameCog):
                     help="Play wordle with tag to specificy which dictionary to use, by default it uses the wordle "
                          "dictionary.")
     async def wordle(self, ctx: StellaContext, tag: Optional[WordleTags] = "wordle", *, flags: WordleFlag):
-        query = "SELECT word FROM wordle_word WHERE tag=$1 AND LENGTH(word)=$2"
-        results = [r['word'] for r in await self.bot.pool_pg.fetch(query, tag, flags.word_count)]
-
-        if not results:
+        if not (dictionary := await self.wordle_dictionaries.get(tag, flags.word_count)):
             raise commands.CommandError(f"Looks like `{tag}` does not have a dictionary for {flags.word_count} word count.")
 
-        games = WordleGame(ctx, name=tag, dictionaries=results, tries=flags.tries, word_length=flags.word_count)
+        games = WordleGame(ctx, name=tag, dictionary=dictionary, tries=flags.tries, word_length=flags.word_count)
         await games.start()
 
     @wordle.command(name="create",
@@ -710,12 +630,13 @@ class WordleCommandCog(BaseGameCog):
             words_attachment = json.load(io.BytesIO(await attachment.read()))
             words.extend([word.upper() for word in words_attachment])
 
-        conflict_sql = "SELECT word FROM wordle_word WHERE tag=$1"
-        list_guess = [r[0] for r in await self.bot.pool_pg.fetch(conflict_sql, tag)]
+        by_length = await self.wordle_dictionaries.fetch_tag(tag)
+        existing = {word for dictionary in by_length.values() for word in dictionary.words}
         sql = "INSERT INTO wordle_word VALUES($1, $2) ON CONFLICT DO NOTHING"
-        to_insert = [[tag, word] for word in words if word not in list_guess]
+        to_insert = [[tag, word] for word in words if word not in existing]
         if to_insert:
             await self.bot.pool_pg.executemany(sql, to_insert)
+            self.wordle_dictionaries.invalidate(tag)
             value = f"{len(to_insert)} was inserted"
         else:
             value = "No value was inserted."
@@ -734,6 +655,7 @@ class WordleCommandCog(BaseGameCog):
 
         sql = "DELETE FROM wordle_word WHERE tag=$1 AND UPPER(word)=ANY($2::VARCHAR[])"
         value = await self.bot.pool_pg.execute(sql, tag, words)
+        self.wordle_dictionaries.invalidate(tag)
         await ctx.maybe_reply(value)
 
     @wordle.command(name="dictionary",
@@ -760,9 +682,7 @@ class WordleCommandCog(BaseGameCog):
     async def wordle_duel(self, ctx: StellaContext, members: Separator[LimitWordleMember],
                           tag: Optional[WordleTags] = "wordle", *, flags: WordleFlag):
 
-        query = "SELECT word FROM wordle_word WHERE tag=$1 AND LENGTH(word)=$2"
-        records = [r[0] for r in await self.bot.pool_pg.fetch(query, tag, flags.word_count)]
-        if not records:
+        if not (dictionary := await self.wordle_dictionaries.get(tag, flags.word_count)):
             raise commands.CommandError(f"Looks like `{tag}` does not have a dictionary for {flags.word_count} word count.")
 
         name = "" if tag is None or tag == "wordle" else f"[{tag}]"
@@ -778,7 +698,8 @@ class WordleCommandCog(BaseGameCog):
         if not players:
             raise commands.CommandError(f"Looks like everyone declined. Sorry `{ctx.author}`.")
 
-        games = MultiWordle(ctx, ctx.author, *players, dictionaries=records, tries=flags.tries, word_count=flags.word_count)
+        games = MultiWordle(ctx, ctx.author, *players, dictionary=dictionary, tries=flags.tries,
+                            word_count=flags.word_count)
         await games.start()
 
     @wordle.command(name="list", aliases=["lists", "tags"])
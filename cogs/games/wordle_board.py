@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+import io
+import string
+import threading
+from enum import Enum
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import discord
+from PIL import Image, ImageDraw, ImageFont
+
+BOX_SIZE = 50
+MARGIN_BOX = 5
+PADDING = 50
+BACKGROUND_COLOR = 18, 18, 19
+FONT_PATH = "fonts/arialbd.ttf"
+
+
+class LetterKind(Enum):
+    correct: discord.Color = discord.Color(0x538d4e)
+    half_correct: discord.Color = discord.Color(0xb59f3b)
+    incorrect: discord.Color = discord.Color(0x39393c)
+
+
+def create_block(draw, x, y, color):
+    draw.rectangle((x, y, x + BOX_SIZE, y + BOX_SIZE), fill=color, outline=(58, 58, 60))
+
+
+@dataclasses.dataclass
+class Letter:
+    char: str
+    kind: LetterKind
+
+
+def box_position(column: int, row: int) -> Tuple[int, int]:
+    step = BOX_SIZE + MARGIN_BOX * 2
+    return PADDING + MARGIN_BOX + step * column, PADDING + MARGIN_BOX + step * row
+
+
+class TileAtlas:
+    """Every (letter, LetterKind) tile rendered once, a board is drawn by pasting tiles instead of drawing text.
+       Letters outside of the alphabet are rendered the first time they're asked for."""
+    def __init__(self, font_path: str = FONT_PATH, *, font_size: int = 40):
+        self.font_path = font_path
+        self.font_size = font_size
+        self.tiles: Dict[Tuple[str, LetterKind], Image.Image] = {}
+        self._font: Optional[ImageFont.FreeTypeFont] = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} tiles={len(self.tiles)}>"
+
+    @property
+    def font(self) -> ImageFont.FreeTypeFont:
+        if self._font is None:
+            self._font = ImageFont.truetype(self.font_path, self.font_size)
+        return self._font
+
+    def build(self, chars: Iterable[str] = string.ascii_uppercase) -> None:
+        for char in chars:
+            for kind in LetterKind:
+                self.tile(char, kind)
+
+    def render_tile(self, char: str, kind: LetterKind) -> Image.Image:
+        # same drawing as a letter drawn straight on the board, the text is allowed to go over the box
+        tile = Image.new("RGB", (BOX_SIZE + 1, BOX_SIZE + 1), BACKGROUND_COLOR)
+        draw = ImageDraw.Draw(tile)
+        create_block(draw, 0, 0, kind.value.to_rgb())
+        _, _, x2, y2 = draw.textbbox((0, 0), char, font=self.font)
+        x = (BOX_SIZE - x2) / 2
+        y = -(MARGIN_BOX / 2) + ((BOX_SIZE - y2) / 2)  # for some reason i need to subtract 2
+        draw.text((x, y), char, (255, 255, 255), font=self.font)
+        return tile
+
+    def tile(self, char: str, kind: LetterKind) -> Image.Image:
+        if (tile := self.tiles.get((char, kind))) is None:
+            with self._lock:
+                if (tile := self.tiles.get((char, kind))) is None:
+                    tile = self.tiles[char, kind] = self.render_tile(char, kind)
+        return tile
+
+
+@functools.lru_cache(maxsize=None)
+def board_template(word_length: int, tries: int) -> Image.Image:
+    """Empty board shared by every game of the same size, it must be copied before anything is pasted on it."""
+    x = (BOX_SIZE + (MARGIN_BOX * 2)) * word_length + PADDING * 2
+    y = (BOX_SIZE + (MARGIN_BOX * 2)) * tries + PADDING * 2
+    background = Image.new("RGB", (x, y), BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(background)
+    for row in range(tries):
+        for column in range(word_length):
+            create_block(draw, *box_position(column, row), BACKGROUND_COLOR)
+    return background
+
+
+tile_atlas = TileAtlas()
+
+
+def render_board(display: Sequence[Sequence[Optional[Letter]]], word_length: int, tries: int, *,
+                 atlas: TileAtlas = tile_atlas) -> io.BytesIO:
+    """Pastes the tile of every guessed letter on a copy of the board template and encodes it as PNG. A row that
+       contains None is left empty."""
+    board = board_template(word_length, tries).copy()
+    for y, row in enumerate(display):
+        if any(letter is None for letter in row):
+            continue
+        for x, letter in enumerate(row):
+            board.paste(atlas.tile(letter.char, letter.kind), box_position(x, y))
+
+    byte = io.BytesIO()
+    # the board is mostly flat colours, the fastest compression is barely any bigger
+    board.save(byte, format="PNG", compress_level=1)
+    byte.seek(0)
+    return byte
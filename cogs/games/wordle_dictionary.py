@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import functools
+import random
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from utils.cache import LRUCache
+
+if TYPE_CHECKING:
+    from main import StellaBot
+
+WordsByLength = Dict[int, "WordleDictionary"]
+
+
+@dataclasses.dataclass(frozen=True)
+class WordleDictionary:
+    """Words of a tag with the same length. Guesses are checked against the frozenset, answers are picked from
+       the tuple."""
+    tag: str
+    length: int
+    words: Tuple[str, ...]
+    lookup: FrozenSet[str]
+
+    @classmethod
+    def from_words(cls, tag: str, length: int, words: Iterable[str]) -> WordleDictionary:
+        lookup = frozenset(words)
+        return cls(tag, length, tuple(lookup), lookup)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.lookup
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def random_word(self) -> str:
+        return random.choice(self.words)
+
+
+class WordleDictionaries:
+    """Every word of a tag is fetched in one query and grouped by length. Tags are cached until wordle insert or
+       wordle remove invalidates them, games of the same tag, duels included, share the same WordleDictionary."""
+    def __init__(self, bot: StellaBot, *, maxsize: int = 64):
+        self.bot = bot
+        self.tags: LRUCache[str, WordsByLength] = LRUCache(maxsize, name="wordle_dictionaries")
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def get(self, tag: str, length: int) -> Optional[WordleDictionary]:
+        """Returns the words of length in tag, or None when the tag has none."""
+        return (await self.fetch_tag(tag)).get(length)
+
+    async def fetch_tag(self, tag: str) -> WordsByLength:
+        if (by_length := self.tags.get(tag)) is not None:
+            return by_length
+
+        if (task := self._pending.get(tag)) is None:
+            task = self._pending[tag] = asyncio.create_task(self._load(tag))
+            task.add_done_callback(functools.partial(self._clear_pending, tag))
+        return await asyncio.shield(task)
+
+    def _clear_pending(self, tag: str, task: asyncio.Task) -> None:
+        # invalidate may have dropped this task, and a newer load of the tag may have taken its place
+        if self._pending.get(tag) is task:
+            del self._pending[tag]
+
+    async def _load(self, tag: str) -> WordsByLength:
+        generation = self.tags.generation(tag)
+        grouped: Dict[int, list] = {}
+        for record in await self.bot.pool_pg.fetch("SELECT word FROM wordle_word WHERE tag=$1", tag):
+            grouped.setdefault(len(record["word"]), []).append(record["word"])
+
+        by_length = {length: WordleDictionary.from_words(tag, length, words) for length, words in grouped.items()}
+        self.tags.set(tag, by_length, generation=generation)
+        return by_length
+
+    def invalidate(self, tag: str) -> None:
+        self.tags.invalidate(tag)
+        self._pending.pop(tag, None)
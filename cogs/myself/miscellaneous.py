@@ -15,8 +15,11 @@ from .flags import AddBotFlag, SQLFlag, ClearFlag
 from utils import flags as flg
 from utils import greedy_parser
 from utils.buttons import InteractionPages
+from utils.cache import cache_stats_table
 from utils.decorators import pages
 from utils.greedy_parser import UntilFlag
+from utils.image_manipulation import render_farm
+from utils.lazy_import import import_report
 from utils.new_converters import (CodeblockConverter, IsBot)
 from utils.useful import (StellaContext, StellaEmbed, aware_utc)
 from .interaction import InteractionServers, show_server
@@ -243,6 +246,31 @@ class Miscellaneous(BaseMyselfCog):
             json.dump(bot_var, w, indent=4)
         await ctx.confirmed()
 
+    @commands.command()
+    async def importreport(self, ctx: StellaContext):
+        """Shows the time each lazily imported module took to import."""
+        await ctx.maybe_reply(f"```\n{import_report.table()}```")
+
+    @commands.command()
+    async def cachestats(self, ctx: StellaContext):
+        """Shows the hit rate of every named cache."""
+        await ctx.maybe_reply(f"```\n{cache_stats_table()}```")
+
+    @commands.command()
+    async def renderstats(self, ctx: StellaContext):
+        """Shows the timing of every chart rendered by the render farm."""
+        await ctx.maybe_reply(f"```\n{render_farm!r}\n{render_farm.table()}```")
+
+    @commands.command()
+    async def uploadstats(self, ctx: StellaContext):
+        """Shows how many uploads were deduplicated by the file index."""
+        await ctx.maybe_reply(f"```\n{ctx.bot.stella_api.file_index.stats}```")
+
+    @commands.command()
+    async def ipcstats(self, ctx: StellaContext):
+        """Shows the requests in flight and the round trip latency of every IPC endpoint."""
+        await ctx.maybe_reply(f"```\n{ctx.bot.ipc_client.requests.table()}```")
+
     @commands.command()
     async def servers(self, ctx: StellaContext):
         values = ctx.bot.guilds
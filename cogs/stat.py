@@ -1,20 +1,20 @@
 from __future__ import annotations
 import datetime
 import discord
-import matplotlib
 import io
 from typing import Union, Literal, TYPE_CHECKING, Optional
 from utils import flags as flg
+from utils.chart_cache import chart_key
 from utils.greedy_parser import UntilFlag, command
-from utils.image_manipulation import get_majority_color, islight, create_graph, process_image, create_bar
+from utils.image_manipulation import create_graph, create_bar
 from utils.new_converters import TimeConverter, IsBot
+from utils.timeseries import align_bins, bin_times
 from utils.useful import StellaContext
 from discord.ext import commands
 
 if TYPE_CHECKING:
     from main import StellaBot
 
-matplotlib.use('Agg')
 TimeConvert = TimeConverter(datetime.timedelta(days=2), datetime.timedelta(weeks=8))
 
 
@@ -57,6 +57,11 @@ class BotActivityFlag(ColorFlag):
         help="Makes the graph curvy, rather than a straight cut. Defaults to False.",
         default=False
     )
+    bins: Optional[commands.Range[int, 3, 100]] = flg.flag(
+        aliases=["B"],
+        help="The amount of points on the graph, between 3 and 100. Defaults to 10.",
+        default=10
+    )
 
 
 class Stat(commands.Cog, name="Statistic"):
@@ -75,16 +80,21 @@ class Stat(commands.Cog, name="Statistic"):
         if isinstance(target, str):
             target = await ElseConverter().convert(ctx, target)
 
-        time_rn = datetime.datetime.utcnow()
+        # whole minutes, so the same graph is asked within a minute hits the chart cache
+        time_rn = datetime.datetime.utcnow().replace(second=0, microsecond=0)
         flags = dict(flags)
-        time_given = flags.get("time") or time_rn - datetime.timedelta(days=2)
+        time_given = (flags.pop("time") or time_rn - datetime.timedelta(days=2)).replace(second=0, microsecond=0)
         if isinstance(target, discord.Member):
-            query = "SELECT * FROM commands_list WHERE guild_id=$1 AND bot_id=$2 AND time_used > $3"
+            query = "SELECT hour, SUM(usage) AS usage FROM commands_rollup " \
+                    "WHERE guild_id=$1 AND bot_id=$2 AND hour >= DATE_TRUNC('hour', $3::TIMESTAMP) " \
+                    "GROUP BY hour"
             values = (ctx.guild.id, target.id, time_given)
             error = "Looks like no data is present for this bot."
             method = "display_avatar"
         else:
-            query = "SELECT * FROM commands_list WHERE guild_id=$1 AND time_used > $2"
+            query = "SELECT hour, SUM(usage) AS usage FROM commands_rollup " \
+                    "WHERE guild_id=$1 AND hour >= DATE_TRUNC('hour', $2::TIMESTAMP) " \
+                    "GROUP BY hour"
             values = (target.id, time_given)
             error = "Looks like i dont know anything in this server."
             method = "icon"
@@ -92,44 +102,29 @@ class Stat(commands.Cog, name="Statistic"):
         data = await self.bot.pool_pg.fetch(query, *values)
         if not data:
             raise commands.CommandError(error)
-        bot_based_time = {}
-        total_seconds = (time_rn - time_given).total_seconds()
-        each_time = datetime.timedelta(seconds=total_seconds / 10)
-        for each in range(10):
-            within_time = []
-            after = time_rn - each_time * each
-            before = time_rn - each_time * (each + 1)
-            for row in data:
-                if before < row["time_used"] < after:
-                    within_time.append(row)
-
-            bot_based_time.update({before: len(within_time)})
-
-        x = list(bot_based_time)
-        y = list(bot_based_time.values())
+        # rows are hourly buckets, windows are whole hours starting at the first bucket so none is split or dropped
+        start, end, bins = align_bins(time_given, time_rn, flags.pop("bins"), datetime.timedelta(hours=1))
+        x, y = bin_times([row["hour"] for row in data], start, end, bins=bins,
+                         weights=[row["usage"] for row in data])
 
         asset = getattr(target, method)
-        async with ctx.typing():
-            avatar_bytes = io.BytesIO(await asset.read())
+
+        async def render() -> bytes:
             if not flags.get("color"):
-                new_color = major = await get_majority_color(avatar_bytes)
-                if not islight(*major.to_rgb()) or member == ctx.me:
-                    new_color = discord.Color(ctx.bot.color)
-                flags["color"] = new_color
+                avatar = await self.bot.avatar_cache.info(asset)
+                flags["color"] = avatar.chart_color(discord.Color(ctx.bot.color), use_fallback=member == ctx.me)
 
-            graph = await create_graph(x, y, **flags)
-            to_send = await process_image(avatar_bytes, graph)
+            with await create_graph(x, y, **flags) as graph, \
+                    await self.bot.avatar_cache.compose(asset, graph) as to_send:
+                return to_send.getvalue()
+
+        key = chart_key("botactivity", x, y, flags.get("color"), flags.get("smooth"), asset.key, member == ctx.me)
+        async with ctx.typing():
+            png = await self.bot.chart_cache.get_or_render(key, render)
         embed = discord.Embed()
         embed.set_image(url="attachment://picture.png")
         embed.set_author(name=target, icon_url=asset)
-        await ctx.embed(embed=embed, file=discord.File(to_send, filename="picture.png"))
-        graph.close()
-        avatar_bytes.close()
-        to_send.close()
-
-        del graph
-        del avatar_bytes
-        del to_send
+        await ctx.embed(embed=embed, file=discord.File(io.BytesIO(png), filename="picture.png"))
 
     @command(aliases=["topcommand", "tc", "tcs"],
              help="Generate a bar graph for 10 most used command for a bot.")
@@ -139,7 +134,7 @@ class Stat(commands.Cog, name="Statistic"):
                           *, flags: ColorFlag):
         target = member
         if isinstance(target, discord.Member):
-            query = "SELECT command, COUNT(command) AS usage FROM commands_list " \
+            query = "SELECT command, SUM(usage) AS usage FROM commands_rollup " \
                     "WHERE guild_id=$1 AND bot_id=$2 " \
                     "GROUP BY bot_id, command " \
                     "ORDER BY usage DESC LIMIT 10"
@@ -148,7 +143,7 @@ class Stat(commands.Cog, name="Statistic"):
             method = "display_avatar"
         else:
             target = await ElseConverter().convert(ctx, target)
-            query = "SELECT command, COUNT(command) AS usage FROM commands_list " \
+            query = "SELECT command, SUM(usage) AS usage FROM commands_rollup " \
                     "WHERE guild_id=$1 " \
                     "GROUP BY command " \
                     "ORDER BY usage DESC LIMIT 10;"
@@ -168,23 +163,24 @@ class Stat(commands.Cog, name="Statistic"):
                        ylabel="Commands")
 
         asset = getattr(target, method)
-        async with ctx.typing():
-            avatar_bytes = io.BytesIO(await asset.read())
+
+        async def render() -> bytes:
             if not (color := flags.color):
-                color = major = await get_majority_color(avatar_bytes)
-                if not islight(*major.to_rgb()) or member == ctx.me:
-                    color = discord.Color(ctx.bot.color)
+                avatar = await self.bot.avatar_cache.info(asset)
+                color = avatar.chart_color(discord.Color(ctx.bot.color), use_fallback=member == ctx.me)
 
-            bar = await create_bar(names, usages, str(color), **payload)
-            to_send = await process_image(avatar_bytes, bar)
+            with await create_bar(names, usages, str(color), **payload) as bar, \
+                    await self.bot.avatar_cache.compose(asset, bar) as to_send:
+                return to_send.getvalue()
+
+        key = chart_key("topcommands", names, usages, payload, flags.color, asset.key, member == ctx.me)
+        async with ctx.typing():
+            png = await self.bot.chart_cache.get_or_render(key, render)
 
         embed = discord.Embed()
         embed.set_image(url="attachment://picture.png")
         embed.set_author(name=target, icon_url=asset)
-        await ctx.embed(embed=embed, file=discord.File(to_send, filename="picture.png"))
-        bar.close()
-        avatar_bytes.close()
-        to_send.close()
+        await ctx.embed(embed=embed, file=discord.File(io.BytesIO(png), filename="picture.png"))
 
 
 async def setup(bot: StellaBot) -> None:
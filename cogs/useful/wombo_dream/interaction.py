@@ -337,7 +337,7 @@ class WomboResult(ViewAuthor):
 
         new_gif = await self.generate_gif(image_bytes)
         filename = os.urandom(16).hex() + ".gif"
-        return await self.context.bot.upload_file(byte=new_gif.read(), filename=filename)
+        return await self.context.bot.upload_file(byte=new_gif, filename=filename)
 
     @button(emoji='<a:OMPS_flecha:834116301483540531>', label=IMG_GENERATION, style=discord.ButtonStyle.blurple, row=0)
     async def show_gif(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
@@ -520,8 +520,7 @@ class ImageManagementView(ViewAuthor):
 
     async def get_image(self, fp: ImageMetaData):
         if not (url := self._cached_urls.get(fp)):
-            with open(fp.full_fp, "rb") as r:
-                file = await self.bot.upload_file(byte=r.read(), filename=fp.name)
+            file = await self.bot.upload_file(byte=fp.full_fp, filename=fp.name)
             self._cached_urls[fp] = url = file.url
         return url
 
@@ -13,7 +13,7 @@ import re
 import time
 
 from os.path import dirname, join
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 import asyncpg
 import discord
@@ -25,10 +25,15 @@ from discord.ext import commands
 from dotenv import load_dotenv
 
 from utils.buttons import PersistentRespondView
+from utils.avatar_cache import AvatarCache
+from utils.cache import LRUCache
+from utils.chart_cache import ChartCache
 from utils.context_managers import UserLock
 from utils.decorators import event_check, in_executor, wait_ready
-from utils.ipc import StellaClient, StellaAPI, StellaFile
-from utils.prefix_ai import DerivativeNeuralNetwork, PrefixNeuralNetwork
+from utils.image_manipulation import render_farm
+from utils.ipc import StellaClient, StellaAPI, StellaFile, UploadSource
+from utils.lazy_import import warm_up
+from utils.prefix_numpy import NumpyDerivativeNeuralNetwork, PrefixNeuralNetwork
 from utils.useful import ListCall, StellaContext, count_source_lines, print_exception
 
 dotenv_path = join(dirname(__file__), 'bot_settings.env')
@@ -53,8 +58,10 @@ class StellaBot(commands.Bot):
         self.stella_api = StellaAPI(self)
         self.ipc_key = kwargs.pop("ipc_key")
         self.ipc_port = kwargs.pop("ipc_port")
-        self.ipc_client = StellaClient(host=self.websocket_IP, secret_key=self.ipc_key, port=self.ipc_port)
+        self.ipc_client = StellaClient(host=self.websocket_IP, secret_key=self.ipc_key, port=self.ipc_port,
+                                       binary_framing=kwargs.pop("ipc_binary_framing", False))
         self.git_token = kwargs.pop("git_token")
+        self.lazy_warm_up = kwargs.pop("lazy_warm_up", None)
         self.error_channel_id = kwargs.pop("error_channel")
         self.bot_guild_id = kwargs.pop("bot_guild")
         self.git = None
@@ -67,6 +74,9 @@ class StellaBot(commands.Bot):
         self.token = kwargs.pop("token", None)
         self.blacklist = set()
         self.existing_prefix = {}
+        self.prefix_predictions = LRUCache(4096, name="prefix_predictions")
+        self.avatar_cache = AvatarCache()
+        self.chart_cache = ChartCache(directory=kwargs.pop("chart_cache_dir", None))
         self.cached_context = collections.deque(maxlen=100)
         self.command_running = {}
         self.user_lock = {}
@@ -88,7 +98,13 @@ class StellaBot(commands.Bot):
 
         kweights = kwargs.pop("prefix_weights")
         self.prefix_neural_network = PrefixNeuralNetwork.from_weight(*kweights.values())
-        self.derivative_prefix_neural = DerivativeNeuralNetwork(kwargs.pop("prefix_derivative"))
+        derivative_path = kwargs.pop("prefix_derivative")
+        if derivative_path.endswith(".npz"):
+            self.derivative_prefix_neural = NumpyDerivativeNeuralNetwork(derivative_path)
+        else:
+            # only import tensorflow when the weights were not exported for numpy
+            from utils.prefix_ai import DerivativeNeuralNetwork
+            self.derivative_prefix_neural = DerivativeNeuralNetwork(derivative_path)
 
     @in_executor()
     def get_prefixes_dataset(self, data: List[List[Union[int, str]]]) -> np.array:
@@ -104,6 +120,30 @@ class StellaBot(commands.Bot):
         predicted = np.column_stack((inputs, result.flat[::]))
         return predicted
 
+    @in_executor()
+    def get_guild_prefixes_dataset(self, data: List[List[Union[int, str]]]) -> Dict[int, np.array]:
+        """Same as get_prefixes_dataset for [bot_id, prefix, usage, last_usage] rows of many bots. Each bot is still
+           normalized by its own highest value, but the Neural Network is only called once for every row."""
+        if not data:
+            return {}
+
+        bot_ids = np.array([row[0] for row in data], dtype=np.int64)
+        inputs = np.array([row[1:] for row in data])
+        amounts, epoch_times = inputs[:, 1].astype(np.int32), inputs[:, 2].astype(np.float64)
+
+        # groups maps every row to the index of its bot, so the max of each bot can be gathered back to each row
+        unique_ids, groups, counts = np.unique(bot_ids, return_inverse=True, return_counts=True)
+        max_amounts = np.zeros(unique_ids.size, dtype=np.int32)
+        max_epochs = np.zeros(unique_ids.size, dtype=np.float64)
+        np.maximum.at(max_amounts, groups, amounts)
+        np.maximum.at(max_epochs, groups, epoch_times)
+
+        normalized = np.column_stack((amounts / max_amounts[groups], epoch_times / max_epochs[groups]))
+        result = self.prefix_neural_network.fit(normalized) * 200
+        predicted = np.column_stack((inputs, result.flat[::]))
+        ordered = predicted[np.argsort(groups, kind="stable")]
+        return dict(zip(unique_ids.tolist(), np.split(ordered, np.cumsum(counts)[:-1])))
+
     async def add_blacklist(self, snowflake_id, reason):
         timed = datetime.datetime.utcnow()
         values = (snowflake_id, reason, timed)
@@ -206,7 +246,7 @@ class StellaBot(commands.Bot):
         return self.get_guild(self.bot_guild_id).get_channel(self.error_channel_id)
 
     async def setup_hook(self) -> None:
-        await bot.stella_api.generate_token()
+        await self.stella_api.generate_token()
         self.git = GitHub(self.git_token)  # github uses aiohttp in init, need to put in async context
         await self.after_db()
         self.loop.create_task(self.after_ready())
@@ -216,6 +256,10 @@ class StellaBot(commands.Bot):
         if not self.tester:
             self.add_view(PersistentRespondView(self))
         await self.greet_server()
+        if self.lazy_warm_up:
+            # True warms every lazy module, otherwise it's a list of module names
+            names = None if self.lazy_warm_up is True else self.lazy_warm_up
+            await self.loop.run_in_executor(None, warm_up, names)
 
     async def greet_server(self):
         self.ipc_client(self.user.id)
@@ -247,7 +291,7 @@ class StellaBot(commands.Bot):
             else:
                 print(f"cog {name} is loaded")
 
-        await bot.load_extension("jishaku")
+        await self.load_extension("jishaku")
 
     @to_call.append
     async def fill_bots(self) -> None:
@@ -320,7 +364,7 @@ class StellaBot(commands.Bot):
             await ctx.typing()
         await self.invoke(ctx)
 
-    async def upload_file(self, *, byte: bytes, filename: str, retries: int = 4) -> StellaFile:
+    async def upload_file(self, *, byte: UploadSource, filename: str, retries: int = 4) -> StellaFile:
         return await self.stella_api.upload_file(file=byte, filename=filename, retries=retries)
 
     async def main(self) -> None:
@@ -350,102 +394,105 @@ class StellaBot(commands.Bot):
     async def close(self) -> None:
         await super().close()
         await self.stella_api.close()
+        render_farm.shutdown()
+
+
+def create_bot() -> StellaBot:
+    """Builds the bot from d_json/bot_var.json and registers its events. Render farm workers import this module
+    without running it, so nothing here may run at import time."""
+    intent_data = {x: True for x in ('guilds', 'members', 'emojis', 'messages', 'reactions', 'message_content')}
+    intents = discord.Intents(**intent_data)
+    with open("d_json/bot_var.json") as states_bytes:
+        states = json.load(states_bytes)
+    bot_data = {
+        "token": states.get("TOKEN"),
+        "default_prefix": states.get("DEFAULT_PREFIX", "uwu "),
+        "tester_prefix": states.get("TESTER_PREFIX", "?uwu "),
+        "bot_guild": states.get("BOT_GUILD"),
+        "error_channel": states.get("ERROR_CHANNEL"),
+        "color": 0xffcccb,
+        "db": states.get("DATABASE"),
+        "user_db": states.get("USER"),
+        "pass_db": states.get("PASSWORD"),
+        "tester": states.get("TEST"),
+        "help_src": states.get("HELP_SRC"),
+        "ipc_port": states.get("IPC_PORT"),
+        "ipc_key": states.get("IPC_KEY"),
+        "ipc_binary_framing": states.get("IPC_BINARY_FRAMING", False),
+        "intents": intents,
+        "owner_ids": states.get("OWNER_IDS"),
+        "websocket_ip": states.get("WEBSOCKET_IP"),
+        "prefix_weights": states.get("PREFIX_WEIGHT"),
+        "prefix_derivative": states.get("PREFIX_DERIVATIVE_PATH"),
+        "git_token": states.get("GIT_TOKEN"),
+        "lazy_warm_up": states.get("LAZY_WARM_UP"),
+        "chart_cache_dir": states.get("CHART_CACHE_DIR"),
+        "activity": discord.Activity(type=discord.ActivityType.listening, name="logged to my pc."),
+        "description": "{}'s personal bot that is partially for the public. "
+                       f"Written with only `{count_source_lines('.'):,}` lines. plz be nice"
+    }
+
+    bot = StellaBot(**bot_data)
+
+    @bot.event
+    async def on_ready() -> None:
+        print("bot is ready")
+
+    @bot.event
+    async def on_disconnect() -> None:
+        print("bot disconnected")
+
+    @bot.event
+    async def on_connect() -> None:
+        print("bot connected")
+
+    @bot.event
+    @wait_ready(bot=bot)
+    @event_check(lambda m: not m.author.bot and not bot.tester or bot.sync_is_owner(m.author))
+    async def on_message(message: discord.Message) -> None:
+        if re.fullmatch(rf"<@!?{bot.user.id}>", message.content):
+            await message.channel.send(f"My prefix is `{await bot.get_prefix(message)}`")
+            return
 
+        if message.author.id in bot.blacklist or getattr(message.guild, "id", None) in bot.blacklist:
+            return
 
-intent_data = {x: True for x in ('guilds', 'members', 'emojis', 'messages', 'reactions', 'message_content')}
-intents = discord.Intents(**intent_data)
-with open("d_json/bot_var.json") as states_bytes:
-    states = json.load(states_bytes)
-bot_data = {
-    "token": states.get("TOKEN"),
-    "default_prefix": states.get("DEFAULT_PREFIX", "uwu "),
-    "tester_prefix": states.get("TESTER_PREFIX", "?uwu "),
-    "bot_guild": states.get("BOT_GUILD"),
-    "error_channel": states.get("ERROR_CHANNEL"),
-    "color": 0xffcccb,
-    "db": states.get("DATABASE"),
-    "user_db": states.get("USER"),
-    "pass_db": states.get("PASSWORD"),
-    "tester": states.get("TEST"),
-    "help_src": states.get("HELP_SRC"),
-    "ipc_port": states.get("IPC_PORT"),
-    "ipc_key": states.get("IPC_KEY"),
-    "intents": intents,
-    "owner_ids": states.get("OWNER_IDS"),
-    "websocket_ip": states.get("WEBSOCKET_IP"),
-    "prefix_weights": states.get("PREFIX_WEIGHT"),
-    "prefix_derivative": states.get("PREFIX_DERIVATIVE_PATH"),
-    "git_token": states.get("GIT_TOKEN"),
-    "activity": discord.Activity(type=discord.ActivityType.listening, name="logged to my pc."),
-    "description": "{}'s personal bot that is partially for the public. "
-                   f"Written with only `{count_source_lines('.'):,}` lines. plz be nice"
-}
-
-bot = StellaBot(**bot_data)
-
-
-@bot.event
-async def on_ready() -> None:
-    print("bot is ready")
-
-
-@bot.event
-async def on_disconnect() -> None:
-    print("bot disconnected")
-
-
-@bot.event
-async def on_connect() -> None:
-    print("bot connected")
-
-
-@bot.event
-@wait_ready(bot=bot)
-@event_check(lambda m: not m.author.bot and not bot.tester or bot.sync_is_owner(m.author))
-async def on_message(message: discord.Message) -> None:
-    if re.fullmatch(rf"<@!?{bot.user.id}>", message.content):
-        await message.channel.send(f"My prefix is `{await bot.get_prefix(message)}`")
-        return
-
-    if message.author.id in bot.blacklist or getattr(message.guild, "id", None) in bot.blacklist:
-        return
-
-    if await bot.is_owner(message.author) and message.attachments:
-        ctx = await bot.get_context(message)
-        if ctx.valid:
-            return await bot.invoke(ctx)
-
-        text_command = ["text/plain", "text/x-python"]
-        for a in message.attachments:
-            with contextlib.suppress(ValueError):
-                index = text_command.index(a.content_type)
-                attachment = await a.read()
-                new_message = copy.copy(message)
-                # Yes, i'm extremely lazy to get the command, and call the codeblock converter
-                # Instead, i make a new message, and make it a command.
-                if index:
-                    prefix = await bot.get_prefix(message)
-                    new_message.content = f"{prefix}jsk py ```py\n{attachment.decode('utf-8')}```"
-                else:
-                    new_message.content = attachment.decode('utf-8')
-                await bot.process_commands(new_message)
-
-    await bot.process_commands(message)
-
-
-@bot.event
-async def on_command(ctx: StellaContext):
-    bot.cached_context.append(ctx)
-
-
-@bot.before_invoke
-async def on_command_before_invoke(ctx: StellaContext):
-    ctx.running = True
-
-
-@bot.after_invoke
-async def on_command_after_invoke(ctx: StellaContext):
-    ctx.running = False
-
-
-bot.starter()
+        if await bot.is_owner(message.author) and message.attachments:
+            ctx = await bot.get_context(message)
+            if ctx.valid:
+                return await bot.invoke(ctx)
+
+            text_command = ["text/plain", "text/x-python"]
+            for a in message.attachments:
+                with contextlib.suppress(ValueError):
+                    index = text_command.index(a.content_type)
+                    attachment = await a.read()
+                    new_message = copy.copy(message)
+                    # Yes, i'm extremely lazy to get the command, and call the codeblock converter
+                    # Instead, i make a new message, and make it a command.
+                    if index:
+                        prefix = await bot.get_prefix(message)
+                        new_message.content = f"{prefix}jsk py ```py\n{attachment.decode('utf-8')}```"
+                    else:
+                        new_message.content = attachment.decode('utf-8')
+                    await bot.process_commands(new_message)
+
+        await bot.process_commands(message)
+
+    @bot.event
+    async def on_command(ctx: StellaContext):
+        bot.cached_context.append(ctx)
+
+    @bot.before_invoke
+    async def on_command_before_invoke(ctx: StellaContext):
+        ctx.running = True
+
+    @bot.after_invoke
+    async def on_command_after_invoke(ctx: StellaContext):
+        ctx.running = False
+
+    return bot
+
+
+if __name__ == "__main__":
+    create_bot().starter()
\ No newline at end of file
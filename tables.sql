@@ -9,6 +9,14 @@ CREATE TABLE IF NOT EXISTS commands_list(
      command VARCHAR(100) NOT NULL,
      time_used TIMESTAMP);
 
+CREATE TABLE IF NOT EXISTS commands_rollup(
+     guild_id BIGINT NOT NULL,
+     bot_id BIGINT NOT NULL,
+     command VARCHAR(100) NOT NULL,
+     hour TIMESTAMP NOT NULL,
+     usage INT NOT NULL,
+     PRIMARY KEY(guild_id, bot_id, command, hour));
+
 CREATE TABLE IF NOT EXISTS prefixes_list(
      guild_id BIGINT NOT NULL,
      bot_id BIGINT NOT NULL,
@@ -142,8 +150,25 @@ CREATE TABLE IF NOT EXISTS click_game_logger(
     click_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 )
 
+CREATE TABLE IF NOT EXISTS click_game_minutes(
+    user_id BIGINT NOT NULL,
+    minute TIMESTAMP WITH TIME ZONE NOT NULL,
+    amount INT NOT NULL,
+    PRIMARY KEY(user_id, minute)
+)
+
 CREATE TABLE IF NOT EXISTS either_io(
     user_id BIGINT NOT NULL,
     question_id BIGINT NOT NULL,
     answered INT NOT NULL
+)
+
+CREATE TABLE IF NOT EXISTS stella_files(
+    digest BYTEA NOT NULL,
+    content_type VARCHAR(255) NOT NULL,
+    file_id VARCHAR(100) NOT NULL,
+    file_name VARCHAR(1000) NOT NULL,
+    size INT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY(digest, content_type)
 )
\ No newline at end of file
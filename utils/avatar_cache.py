@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import io
+from typing import Dict, Tuple
+
+import discord
+from PIL import Image
+
+from utils.cache import ByteLRUCache, LRUCache
+from utils.decorators import in_executor
+from utils.image_manipulation import create_backdrop, get_majority_color, islight, paste_chart
+
+
+@dataclasses.dataclass(frozen=True)
+class AvatarInfo:
+    data: bytes
+    color: discord.Color
+    light: bool
+
+    def chart_color(self, fallback: discord.Color, *, use_fallback: bool = False) -> discord.Color:
+        """The majority color, or fallback when it's too dark to be seen on a chart."""
+        return self.color if self.light and not use_fallback else fallback
+
+
+class AvatarCache:
+    """Things derived from an avatar for the chart commands, keyed by the asset key, which changes whenever the
+       avatar does. The raw bytes with the majority color live in one LRUCache, the blurred backdrops are
+       kept as raw RGBA per chart size in a ByteLRUCache, since those are what the PIL work produces."""
+    def __init__(self, maxsize: int = 128, *, max_backdrop_bytes: int = 64 * 2 ** 20):
+        self.infos: LRUCache[str, AvatarInfo] = LRUCache(maxsize, name="avatars")
+        self.backdrops: ByteLRUCache[Tuple[str, int, int]] = ByteLRUCache(max_backdrop_bytes, name="backdrops")
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def info(self, asset: discord.Asset) -> AvatarInfo:
+        if (info := self.infos.get(asset.key)) is not None:
+            return info
+
+        # concurrent charts of the same avatar share a single download
+        if (task := self._pending.get(asset.key)) is None:
+            task = self._pending[asset.key] = asyncio.create_task(self._fetch(asset))
+            task.add_done_callback(lambda _: self._pending.pop(asset.key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, asset: discord.Asset) -> AvatarInfo:
+        data = await asset.read()
+        color = await get_majority_color(io.BytesIO(data))
+        self.infos[asset.key] = info = AvatarInfo(data, color, islight(*color.to_rgb()))
+        return info
+
+    async def compose(self, asset: discord.Asset, chart: io.BytesIO) -> io.BytesIO:
+        """Same result as process_image, with the backdrop reused for every chart of the same avatar and size."""
+        info = await self.info(asset)
+        with Image.open(chart) as image:  # only reads the header
+            w, h = image.size
+        chart.seek(0)
+
+        if (raw := self.backdrops.get((asset.key, w, h))) is None:
+            raw = self.backdrops[asset.key, w, h] = await self._backdrop(info.data, (w, h))
+        return await self._paste(raw, w, chart)
+
+    @staticmethod
+    @in_executor()
+    def _backdrop(data: bytes, size: Tuple[int, int]) -> bytes:
+        with create_backdrop(io.BytesIO(data), size) as background:
+            return background.tobytes()
+
+    @staticmethod
+    @in_executor()
+    def _paste(raw: bytes, width: int, chart: io.BytesIO) -> io.BytesIO:
+        with Image.frombytes("RGBA", (width, len(raw) // (width * 4)), raw) as background:
+            return paste_chart(background, chart)
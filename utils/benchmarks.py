@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import ctypes
+import io
+import random
+import string
+import time
+
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import tabulate
+
+from utils.prefix_numpy import NumpyDerivativeNeuralNetwork
+from utils.useful import PrefixTrie, actually_calls, compile_array, multi_find_prefix
+
+# Benchmarks are meant to be run through jishaku, eg `jsk py from utils.benchmarks import *`
+# Every function returns a table as text so it can be pasted straight into the channel.
+
+PREFIX_LETTERS = string.ascii_letters + string.digits + string.punctuation
+
+
+def _timer(callback: Callable[[], object], /) -> float:
+    start = time.perf_counter()
+    callback()
+    return time.perf_counter() - start
+
+
+def _random_prefixes(size: int, *, rng: random.Random) -> List[str]:
+    prefixes = set()
+    while len(prefixes) < size:
+        prefixes.add("".join(rng.choices(PREFIX_LETTERS, k=rng.randint(1, 6))))
+    return [*prefixes]
+
+
+def benchmark_prefix_search(sizes: Iterable[int] = (10_000, 100_000, 1_000_000), *, messages: int = 10_000,
+                            seed: int = 0) -> str:
+    """Compares the binary search prefix matching against the trie prefix matching on randomly generated prefixes.
+       Half of the messages starts with a known prefix, the other half are random text."""
+    rng = random.Random(seed)
+    rows: List[Tuple[int, float, float, float, float]] = []
+    for size in sizes:
+        prefixes = _random_prefixes(size, rng=rng)
+        contents = []
+        for i in range(messages):
+            text = "".join(rng.choices(PREFIX_LETTERS, k=31))
+            if i % 2:
+                text = (rng.choice(prefixes) + text)[:31]
+            contents.append(text.encode("utf-8"))
+
+        compiled = None
+        trie = None
+
+        def build_array() -> None:
+            nonlocal compiled
+            compiled = compile_array(sorted(prefixes))
+
+        def build_trie() -> None:
+            nonlocal trie
+            trie = PrefixTrie(prefixes)
+
+        def search_array() -> None:
+            for content in contents:
+                actually_calls((compiled, ctypes.create_string_buffer(content)), multi_find_prefix)
+
+        def search_trie() -> None:
+            for content in contents:
+                trie.search(ctypes.create_string_buffer(content))
+
+        rows.append((size, _timer(build_array), _timer(search_array) / messages * 1e6,
+                     _timer(build_trie), _timer(search_trie) / messages * 1e6))
+
+    headers = ["Prefixes", "Sort build (s)", "Binary search (µs/msg)", "Trie build (s)", "Trie (µs/msg)"]
+    return tabulate.tabulate(rows, headers=headers, floatfmt=".3f")
+
+
+def benchmark_derivative_network(weight_path: str, npz_path: str, *, runs: int = 200, batch: int = 256,
+                                 seed: int = 0) -> str:
+    """Exports the keras DerivativeNeuralNetwork weights into npz_path, which checks them against keras, then
+       compares the time of a single row and of a batch."""
+    from utils.prefix_ai import DerivativeNeuralNetwork
+
+    keras_network = DerivativeNeuralNetwork(weight_path)
+    keras_network.export_weights(npz_path, check=False)
+    difference = keras_network.check_numpy_parity(npz_path, rows=batch, seed=seed)
+    numpy_network = NumpyDerivativeNeuralNetwork(npz_path)
+
+    rows = np.random.default_rng(seed).random((batch, numpy_network.input_output_size))
+
+    single = rows[:1]
+    table = []
+    for name, network in ("Keras", keras_network), ("NumPy", numpy_network):
+        single_time = _timer(lambda: [network.forward(single) for _ in range(runs)]) / runs
+        batch_time = _timer(lambda: [network.forward(rows) for _ in range(runs)]) / runs
+        table.append((name, single_time * 1e6, batch_time * 1e6))
+
+    headers = ["Network", "1 row (µs)", f"{batch} rows (µs)"]
+    return f"Max difference: {difference:.2e}\n" + tabulate.tabulate(table, headers=headers, floatfmt=".2f")
+
+
+def benchmark_wordle_render(*, games: int = 20, word_length: int = 5, tries: int = 6, font_path: Optional[str] = None,
+                            seed: int = 0) -> str:
+    """Compares drawing every letter of a wordle board with a freshly loaded font against pasting tiles from the
+       atlas, per guess, for games that guess random words until the board is full."""
+    from PIL import Image, ImageDraw, ImageFont
+    from cogs.games.wordle_board import (BACKGROUND_COLOR, BOX_SIZE, FONT_PATH, MARGIN_BOX, PADDING, Letter,
+                                         LetterKind, TileAtlas, board_template, box_position, create_block,
+                                         render_board)
+
+    font_path = font_path or FONT_PATH
+    rng = random.Random(seed)
+    boards = [[[Letter(rng.choice(string.ascii_uppercase), rng.choice([*LetterKind])) for _ in range(word_length)]
+               for _ in range(tries)] for _ in range(games)]
+
+    def draw_letters() -> List[int]:
+        sizes = []
+        for display in boards:
+            size = (BOX_SIZE + MARGIN_BOX * 2) * word_length + PADDING * 2, \
+                   (BOX_SIZE + MARGIN_BOX * 2) * tries + PADDING * 2
+            background = Image.new("RGB", size, BACKGROUND_COLOR)
+            draw = ImageDraw.Draw(background)
+            for row in range(tries):
+                for column in range(word_length):
+                    create_block(draw, *box_position(column, row), BACKGROUND_COLOR)
+            for row, letters in enumerate(display):
+                for column, letter in enumerate(letters):
+                    x1, y1 = box_position(column, row)
+                    create_block(draw, x1, y1, letter.kind.value.to_rgb())
+                    font = ImageFont.truetype(font_path, 40)
+                    _, _, x2, y2 = draw.textbbox((0, 0), letter.char, font=font)
+                    draw.text((x1 + (BOX_SIZE - x2) / 2, y1 - MARGIN_BOX / 2 + (BOX_SIZE - y2) / 2), letter.char,
+                              (255, 255, 255), font=font)
+                byte = io.BytesIO()
+                background.save(byte, format="PNG")
+                sizes.append(byte.tell())
+        return sizes
+
+    def paste_tiles() -> List[int]:
+        sizes = []
+        for display in boards:
+            for row in range(1, tries + 1):
+                sizes.append(len(render_board(display[:row], word_length, tries, atlas=atlas).getvalue()))
+        return sizes
+
+    atlas = TileAtlas(font_path)
+    board_template.cache_clear()
+    build_time = _timer(atlas.build) + _timer(lambda: board_template(word_length, tries))
+    guesses = games * tries
+    table = []
+    for name, callback in ("Draw letters", draw_letters), ("Tile atlas", paste_tiles):
+        sizes: List[int] = []
+        elapsed = _timer(lambda: sizes.extend(callback()))
+        table.append((name, elapsed / guesses * 1e3, sum(sizes) / len(sizes) / 1024))
+
+    headers = ["Renderer", "Per guess (ms)", "Avg PNG (KiB)"]
+    return f"Atlas build: {build_time * 1e3:.1f}ms, {len(atlas.tiles)} tiles\n" + \
+        tabulate.tabulate(table, headers=headers, floatfmt=".2f")
+
+
+async def benchmark_ipc_framing(*, messages: int = 20_000, concurrency: int = 32, rounds: int = 3) -> str:
+    """Round trips of the IPC JSON messages against the negotiated binary frames, through a websocket server on
+       localhost that decodes every request and answers its data back, like the IPC server would. Both ends share
+       the loop, so the best of rounds is kept."""
+    import asyncio
+    import json
+    import os
+
+    import aiohttp
+    from aiohttp import web
+
+    from utils.ipc_framing import BINARY_FORMAT, BinaryCodec, split_frame
+
+    async def stand_in(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        codec = BinaryCodec("stand-in")
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.BINARY:
+                request_id, endpoint, body = split_frame(msg.data)
+                await ws.send_bytes(codec.encode(endpoint, request_id, json.loads(body)))
+                continue
+
+            payload = msg.json()
+            response = payload["data"]
+            if payload["endpoint"] == "negotiate_framing" and BINARY_FORMAT in response["formats"]:
+                response = {"format": BINARY_FORMAT, "session": codec.session}
+            await ws.send_json({"endpoint": payload["endpoint"], "request_id": payload["request_id"],
+                                "response": response})
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", stand_in)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    auth = {"Authorization": os.urandom(16).hex(), "Bot_id": 1234567890123456789}
+    data = {"user_id": 1234567890123456789, "guild_id": 9876543210987654321, "command": "help", "count": 3}
+
+    async def run(binary: bool) -> Tuple[float, float]:
+        futures = {}
+        sizes = []
+        async with aiohttp.ClientSession() as session, session.ws_connect(f"http://127.0.0.1:{port}/") as ws:
+            codec = None
+            if binary:
+                await ws.send_json({"endpoint": "negotiate_framing", "request_id": os.urandom(32).hex(),
+                                    "headers": auth, "data": {"formats": [BINARY_FORMAT]}})
+                codec = BinaryCodec((await ws.receive_json())["response"]["session"])
+
+            async def reader() -> None:
+                async for msg in ws:
+                    sizes.append(len(msg.data))
+                    message = BinaryCodec.decode(msg.data) if msg.type == aiohttp.WSMsgType.BINARY else msg.json()
+                    futures.pop(message["request_id"]).set_result(message["response"])
+
+            async def request() -> None:
+                for _ in range(messages // concurrency):
+                    future = asyncio.get_running_loop().create_future()
+                    if codec is not None:
+                        request_id = codec.new_request_id()
+                        futures[request_id] = future
+                        frame = codec.encode("benchmark", request_id, data)
+                        await ws.send_bytes(frame)
+                    else:
+                        request_id = os.urandom(32).hex()
+                        futures[request_id] = future
+                        frame = json.dumps({"endpoint": "benchmark", "request_id": request_id, "headers": auth,
+                                            "data": data})
+                        await ws.send_str(frame)
+                    sizes.append(len(frame))
+                    await future
+
+            reading = asyncio.create_task(reader())
+            start = time.perf_counter()
+            await asyncio.gather(*[request() for _ in range(concurrency)])
+            elapsed = time.perf_counter() - start
+            reading.cancel()
+        return messages // concurrency * concurrency / elapsed, sum(sizes) / len(sizes)
+
+    try:
+        table = []
+        for name, binary in ("JSON", False), ("Binary", True):
+            results = [await run(binary) for _ in range(rounds)]
+            table.append((name, *max(results)))
+    finally:
+        await runner.cleanup()
+
+    headers = ["Framing", "Round trips/s", "Avg frame (B)"]
+    return f"{messages} requests, {concurrency} in flight\n" + tabulate.tabulate(table, headers=headers, floatfmt=".1f")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+from utils.useful import print_exception
+
+if TYPE_CHECKING:
+    from main import StellaBot
+
+
+@dataclass
+class BufferStats:
+    flushes: int = 0
+    failures: int = 0
+    rows: int = 0
+    dropped: int = 0
+    last_latency: float = 0
+    max_latency: float = 0
+    total_latency: float = 0
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / (self.flushes or 1)
+
+
+class WriteBehindBuffer(abc.ABC):
+    """Collects writes in memory and flushes them to the database in bulk, every interval seconds or as soon as
+       size rows are waiting. Subclasses decides how rows are merged and written.
+
+       A failed batch is put back into the buffer, up to max_backlog rows are kept while the database is down and
+       the oldest rows are dropped past that. A batch that failed max_failures flushes in a row is dropped, so a
+       row the database always rejects doesn't block every flush after it."""
+    def __init__(self, bot: StellaBot, *, interval: float = 2, size: int = 500, max_backlog: int = 100_000,
+                 max_failures: int = 10):
+        self.bot = bot
+        self.interval = interval
+        self.size = size
+        self.max_backlog = max_backlog
+        self.max_failures = max_failures
+        self.stats = BufferStats()
+        self.failures_in_row = 0
+        self._task: Optional[asyncio.Task] = None
+        self.flush_lock = asyncio.Lock()
+        self._pending_flush: Optional[asyncio.Task] = None
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Amount of rows that are waiting to be flushed."""
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} backlog={len(self)} flushes={self.stats.flushes} " \
+               f"failures={self.stats.failures} rows={self.stats.rows} dropped={self.stats.dropped} " \
+               f"average_latency={self.stats.average_latency * 1e3:.2f}ms " \
+               f"max_latency={self.stats.max_latency * 1e3:.2f}ms>"
+
+    @abc.abstractmethod
+    def take(self) -> Any:
+        """Removes every waiting row from the buffer and returns them."""
+
+    @abc.abstractmethod
+    def restore(self, data: Any) -> None:
+        """Puts the rows from take back into the buffer after a failed write."""
+
+    @abc.abstractmethod
+    async def write(self, data: Any) -> None:
+        ...
+
+    def drop_oldest(self, amount: int) -> int:
+        """Removes up to amount of the oldest rows once the backlog is over max_backlog, returns how many were
+           removed. Buffers that merge rows into a bounded amount of keys don't need to drop anything."""
+        return 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.flush_loop())
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.try_flush()
+
+    async def try_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            print_exception(f"Error while flushing {self.__class__.__name__}:", e)
+
+    def notify(self) -> None:
+        """Flushes early when the buffer reached its size."""
+        if len(self) >= self.size and (self._pending_flush is None or self._pending_flush.done()):
+            self._pending_flush = asyncio.create_task(self.try_flush())
+
+    async def flush(self) -> int:
+        async with self.flush_lock:
+            if not (rows := len(self)):
+                return 0
+
+            data = self.take()
+            start = time.perf_counter()
+            try:
+                await self.write(data)
+            except Exception:
+                self.stats.failures += 1
+                self.failures_in_row += 1
+                if self.failures_in_row >= self.max_failures:
+                    print(f"{self.__class__.__name__} dropped {rows:,} rows after {self.failures_in_row} failed "
+                          f"flushes")
+                    self.failures_in_row = 0
+                    self.stats.dropped += rows
+                else:
+                    self.restore(data)
+                    if (excess := len(self) - self.max_backlog) > 0:
+                        self.stats.dropped += self.drop_oldest(excess)
+                raise
+
+            self.failures_in_row = 0
+            latency = time.perf_counter() - start
+            self.stats.flushes += 1
+            self.stats.rows += rows
+            self.stats.last_latency = latency
+            self.stats.max_latency = max(self.stats.max_latency, latency)
+            self.stats.total_latency += latency
+            return rows
+
+    async def close(self) -> None:
+        """Stops the flush loop and writes everything that is still waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
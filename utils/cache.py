@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import weakref
+
+from typing import Callable, Dict, Generic, Hashable, Iterator, Optional, TypeVar, Union
+
+import tabulate
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+T = TypeVar("T")
+
+
+@dataclasses.dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.
+
+    def __str__(self) -> str:
+        return f"{self.hits}/{self.lookups} hits ({self.hit_rate:.2%}), {self.evictions} evictions, " \
+               f"{self.invalidations} invalidations"
+
+
+_caches: weakref.WeakValueDictionary[str, LRUCache] = weakref.WeakValueDictionary()
+
+
+class LRUCache(Generic[K, V]):
+    """Least recently used cache with hit rate statistics. The least recently used key is evicted once the cache
+       holds more than maxsize keys. Named caches are listed in cache_stats_table."""
+    def __init__(self, maxsize: int = 1024, *, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.name = name
+        self.stats = CacheStats()
+        # bumped on every invalidation of a key, values computed from data read before that key was invalidated
+        # are not stored. Only invalidated keys are in here, bounded by the distinct keys ever invalidated
+        self._generations: Dict[K, int] = {}
+        self._data: collections.OrderedDict[K, V] = collections.OrderedDict()
+        if name is not None:
+            _caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self._data)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} name={self.name!r} size={self.size_text()} stats=({self.stats})>"
+
+    def size_text(self) -> str:
+        return f"{len(self):,}/{self.maxsize:,}"
+
+    def get(self, key: K, default: T = None) -> Union[V, T]:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.stats.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def __setitem__(self, key: K, value: V) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while self.is_full():
+            self._remove_oldest()
+            self.stats.evictions += 1
+
+    def is_full(self) -> bool:
+        return len(self._data) > self.maxsize
+
+    def _remove(self, key: K) -> Optional[V]:
+        return self._data.pop(key, None)
+
+    def _remove_oldest(self) -> None:
+        self._data.popitem(last=False)
+
+    def generation(self, key: K) -> int:
+        """Read before fetching the data of key, and passed to set once the value is computed."""
+        return self._generations.get(key, 0)
+
+    def set(self, key: K, value: V, *, generation: Optional[int] = None) -> bool:
+        """Stores the value unless key was invalidated since generation was read."""
+        if generation is not None and generation != self.generation(key):
+            return False
+        self[key] = value
+        return True
+
+    def invalidate(self, key: K) -> bool:
+        self._generations[key] = self._generations.get(key, 0) + 1
+        if self._remove(key) is None:
+            return False
+        self.stats.invalidations += 1
+        return True
+
+    def invalidate_where(self, predicate: Callable[[K], bool]) -> int:
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            self.invalidate(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class ByteLRUCache(LRUCache[K, bytes]):
+    """LRUCache of bytes that is bounded by the total length of its values rather than the amount of keys. A value
+       larger than max_bytes is never stored."""
+    def __init__(self, max_bytes: int, *, name: Optional[str] = None):
+        super().__init__(0, name=name)
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+
+    def size_text(self) -> str:
+        return f"{len(self):,} ({self.nbytes / 2 ** 20:,.1f}/{self.max_bytes / 2 ** 20:,.1f} MiB)"
+
+    def __setitem__(self, key: K, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self.nbytes += len(value)
+        super().__setitem__(key, value)
+
+    def is_full(self) -> bool:
+        return self.nbytes > self.max_bytes
+
+    def _remove(self, key: K) -> Optional[bytes]:
+        if (value := super()._remove(key)) is not None:
+            self.nbytes -= len(value)
+        return value
+
+    def _remove_oldest(self) -> None:
+        self.nbytes -= len(self._data.popitem(last=False)[1])
+
+    def clear(self) -> None:
+        super().clear()
+        self.nbytes = 0
+
+
+def cache_stats_table() -> str:
+    rows = [(name, cache.size_text(), cache.stats.hits, cache.stats.misses,
+             f"{cache.stats.hit_rate:.2%}", cache.stats.evictions, cache.stats.invalidations)
+            for name, cache in sorted(_caches.items())]
+    headers = ["Cache", "Size", "Hits", "Misses", "Hit rate", "Evictions", "Invalidations"]
+    return tabulate.tabulate(rows, headers=headers)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+from typing import Any, Awaitable, Callable, Optional
+
+from utils.cache import ByteLRUCache
+from utils.decorators import in_executor
+
+
+def chart_key(kind: str, *parts: Any) -> str:
+    """Hash of everything a rendered chart depends on, such as the data series, colour and avatar key."""
+    payload = json.dumps([kind, *parts], default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ChartCache:
+    """Rendered chart PNGs keyed by chart_key. Charts are kept in a ByteLRUCache in memory and, when directory is
+       given, also written to disk so they survive a restart. The disk tier is pruned by modification time once it
+       grows past max_disk_bytes."""
+    def __init__(self, max_bytes: int = 32 * 2 ** 20, *, directory: Optional[str] = None,
+                 max_disk_bytes: int = 512 * 2 ** 20):
+        self.memory: ByteLRUCache[str] = ByteLRUCache(max_bytes, name="charts")
+        self.directory = pathlib.Path(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_hits = 0
+        self._disk_bytes: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} memory={self.memory.size_text()} directory={self.directory} " \
+               f"disk_hits={self.disk_hits}>"
+
+    def path(self, key: str) -> pathlib.Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if (data := self.memory.get(key)) is not None:
+            return data
+
+        if self.directory is not None and (data := await self._read(key)) is not None:
+            self.disk_hits += 1
+            self.memory[key] = data
+        return data
+
+    async def set(self, key: str, data: bytes) -> None:
+        self.memory[key] = data
+        if self.directory is not None:
+            await self._write(key, data)
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Returns the cached chart, or renders and caches it."""
+        if (data := await self.get(key)) is None:
+            data = await render()
+            await self.set(key, data)
+        return data
+
+    @in_executor()
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    @in_executor()
+    def _write(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # written to a temporary file first, so a reader never sees half a PNG
+        fd, temp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temp, path)
+
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(p.stat().st_size for p in self.directory.glob("*/*.png"))
+        else:
+            self._disk_bytes += len(data)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Removes the oldest files until the disk tier is at 3/4 of max_disk_bytes."""
+        files = sorted(((p.stat(), p) for p in self.directory.glob("*/*.png")), key=lambda x: x[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in files)
+        for stat, path in files:
+            if total <= self.max_disk_bytes * 3 // 4:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+        self._disk_bytes = total
@@ -99,3 +99,13 @@ class BypassError(ArgumentBaseError):
 class NotInDpy(ErrorNoSignature):
     def __init__(self) -> None:
         super().__init__(message="This command is only allowed in `discord.py` server.")
+
+
+class RenderFarmBusy(ErrorNoSignature):
+    def __init__(self) -> None:
+        super().__init__(message="Too many graphs are being made right now, try again in a few seconds.")
+
+
+class ClickGameLoading(ErrorNoSignature):
+    def __init__(self) -> None:
+        super().__init__(message="The click game leaderboard is still loading, try again in a few seconds.")
@@ -1,22 +1,33 @@
+from __future__ import annotations
+
 import datetime
 import io
 import math
-from typing import Coroutine, Any, List, Optional
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 
 import discord
 from PIL import Image, ImageEnhance, ImageFilter
-import matplotlib.dates as mdates
-import matplotlib.colors as mcolors
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
-import matplotlib.patheffects as peffects
-from matplotlib import pyplot as plt
 
 import numpy as np
-from matplotlib.patches import Polygon
-from scipy.interpolate import make_interp_spline
 
 from utils.decorators import in_executor
+from utils.lazy_import import lazy_import
+from utils.render_farm import RenderFarm
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+
+# matplotlib and scipy are only imported once a graph is made, see utils.lazy_import
+mdates = lazy_import("matplotlib.dates")
+mcolors = lazy_import("matplotlib.colors")
+mpatches = lazy_import("matplotlib.patches")
+peffects = lazy_import("matplotlib.patheffects")
+plt = lazy_import("matplotlib.pyplot")
+interpolate = lazy_import("scipy.interpolate")
+
+# graphs are rendered in their own processes, see utils.render_farm
+render_farm = RenderFarm()
 
 
 def create_gradient_array(color: str, *, alpha_min: Optional[int] = 0, alpha_max: Optional[int] = 1) -> np.array:
@@ -26,9 +37,13 @@ def create_gradient_array(color: str, *, alpha_min: Optional[int] = 0, alpha_max
     return z
 
 
-@in_executor()
-def create_graph(x: List[datetime.datetime], y: List[int], **kwargs: int):
-    color = str(kwargs.get("color"))
+async def create_graph(x: List[datetime.datetime], y: List[int], **kwargs: Any) -> io.BytesIO:
+    """Renders the graph inside the render farm, only the color and smooth keyword is used."""
+    color, smooth = str(kwargs.get("color")), bool(kwargs.get("smooth"))
+    return io.BytesIO(await render_farm.render(render_graph, x, y, color=color, smooth=smooth))
+
+
+def render_graph(x: List[datetime.datetime], y: List[int], *, color: str, smooth: bool) -> bytes:
     fig, axes = plt.subplots()
     date_np = np.array(sorted(x))
     value_np = np.array([*reversed(y)])
@@ -36,7 +51,7 @@ def create_graph(x: List[datetime.datetime], y: List[int], **kwargs: int):
 
     # Graph smoothen
     date_num_smooth = np.linspace(date_num.min(), date_num.max(), 100)
-    spl = make_interp_spline(date_num, value_np, k=2 - (not kwargs.get("smooth")))
+    spl = interpolate.make_interp_spline(date_num, value_np, k=2 - (not smooth))
     value_np_smooth = spl(date_num_smooth)
 
     line, = axes.plot(mdates.num2date(date_num_smooth), value_np_smooth, color=color)
@@ -52,7 +67,7 @@ def create_graph(x: List[datetime.datetime], y: List[int], **kwargs: int):
 
     xy = np.column_stack([date_num_smooth, value_np_smooth])
     xy = np.vstack([[xmin, ymin], xy, [xmax, ymin], [xmin, ymin]])
-    clip_path = Polygon(xy, facecolor='none', edgecolor='none', closed=True)
+    clip_path = mpatches.Polygon(xy, facecolor='none', edgecolor='none', closed=True)
     axes.add_patch(clip_path)
     im.set_clip_path(clip_path)
 
@@ -96,8 +111,12 @@ def inverse_color(*rgb: int) -> List[int]:
     return [*map(lambda x: 255 - x, rgb)]
 
 
-@in_executor()
-def create_bar(x_val: List[Any], y_val: List[Any], color: str, **kwargs: Any) -> Coroutine[Any, Any, io.BytesIO]:
+async def create_bar(x_val: List[Any], y_val: List[Any], color: str, **kwargs: str) -> io.BytesIO:
+    """Renders the bar inside the render farm, kwargs are passed to the axes setters such as title."""
+    return io.BytesIO(await render_farm.render(render_bar, x_val, y_val, color, **kwargs))
+
+
+def render_bar(x_val: List[Any], y_val: List[Any], color: str, **kwargs: str) -> bytes:
     h = len(x_val) * .48
     fig, axes = plt.subplots(figsize=(6.4, h))
     bars = axes.barh(x_val, y_val, edgecolor=color)
@@ -147,7 +166,7 @@ def create_bar(x_val: List[Any], y_val: List[Any], color: str, **kwargs: Any) ->
     return save_matplotlib(fig, axes)
 
 
-def save_matplotlib(fig: Figure, axes: Axes) -> io.BytesIO:
+def save_matplotlib(fig: Figure, axes: Axes) -> bytes:
     fig.delaxes(axes)
     fig.add_axes(axes)
     buffer = io.BytesIO()
@@ -155,15 +174,24 @@ def save_matplotlib(fig: Figure, axes: Axes) -> io.BytesIO:
     axes.clear()
     fig.clf()
     plt.close(fig)
-    return buffer
+    return buffer.getvalue()
 
 
 @in_executor()
 def process_image(avatar_bytes: io.BytesIO, target: io.BytesIO) -> io.BytesIO:
-    with Image.open(avatar_bytes).convert('RGBA') as avatar, Image.open(target) as target:
+    with Image.open(target) as chart:
+        size = chart.size
+    target.seek(0)
+    with create_backdrop(avatar_bytes, size) as background:
+        return paste_chart(background, target)
+
+
+def create_backdrop(avatar_bytes: io.BytesIO, size: Tuple[int, int]) -> Image.Image:
+    """Darkened and blurred avatar that goes behind a chart of the given size."""
+    with Image.open(avatar_bytes).convert('RGBA') as avatar:
         side = max(avatar.size)
         avatar = avatar.crop((0, 0, side, side))
-        w, h = target.size
+        w, h = size
         avatar = avatar.resize((w, w))
         offset_below = 10
         avatar = avatar.crop((0, 0, w, h + offset_below))
@@ -172,13 +200,17 @@ def process_image(avatar_bytes: io.BytesIO, target: io.BytesIO) -> io.BytesIO:
         background = background.filter(ImageFilter.GaussianBlur(8))
         gray_back = Image.new('RGBA', avatar.size, (*discord.Color.dark_theme().to_rgb(), 255))
         gray_back.paste(background, [0, 0], mask=background)
-        background = gray_back
+        return gray_back
+
+
+def paste_chart(background: Image.Image, target: io.BytesIO) -> io.BytesIO:
+    """Pastes the chart on top of the backdrop, the backdrop is modified in place."""
+    with Image.open(target) as target:
         background.paste(target, [0, 0], mask=target)
-        to_send = io.BytesIO()
-        background.save(to_send, format="PNG")
-        gray_back.close()
-        to_send.seek(0)
-        return to_send
+    to_send = io.BytesIO()
+    background.save(to_send, format="PNG")
+    to_send.seek(0)
+    return to_send
 
 
 @in_executor()
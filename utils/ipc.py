@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import dataclasses
 import datetime
+import functools
+import hashlib
 import io
 import mimetypes
 import os
 from dataclasses import dataclass
 
-from typing import Any, AsyncIterator, Callable, Coroutine, Dict, List, Optional, TypedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, Dict, List, Optional, Tuple, TypedDict, Union
 
 import aiohttp
 import discord
@@ -16,9 +20,16 @@ from discord.ext import ipc
 from starlette import status
 from typing_extensions import Self
 
+from utils.cache import LRUCache
+from utils.decorators import in_executor
 from utils.errors import TokenInvalid, StellaAPIError
+from utils.ipc_framing import BINARY_FORMAT, BinaryCodec
+from utils.ipc_requests import RequestManager
 from utils.useful import print_exception, except_retry
 
+# bytes like objects are sent as they are, a path is streamed from the disk in chunks
+UploadSource = Union[bytes, bytearray, memoryview, io.BytesIO, str, "os.PathLike[str]"]
+
 
 class IPCData(TypedDict, total=False):
     # requires python 3.11: https://www.python.org/dev/peps/pep-0655
@@ -35,7 +46,7 @@ class _RecvMessagePayload(TypedDict):
 
 class _SendMessagePayload(TypedDict):
     endpoint: str
-    request_id: str
+    request_id: Union[str, int]
     headers: Dict[str, Any]
     data: Dict[str, Any]
 
@@ -44,11 +55,14 @@ _HandlerType = Callable[[IPCData], Coroutine[Any, Any, Any]]
 
 
 class StellaClient(ipc.Client):
-    def __init__(self, *args: Any, **kwargs: Any):
+    def __init__(self, *args: Any, binary_framing: bool = False, **kwargs: Any):
         super().__init__(*args, **kwargs)
         self.bot_id = kwargs.pop("bot_id", None)
-        # callbacks are subscribed to event name and message id
-        self._callbacks: Dict[str, Dict[str, asyncio.Future[IPCData]]] = {}
+        self.binary_framing = binary_framing
+        # None while the session speaks JSON, set once the server agreed on binary frames
+        self.codec: Optional[BinaryCodec] = None
+        # bot_response is answered by the server only when it still waits for it
+        self.requests = RequestManager(timeouts={"bot_response": 10})
         # event handlers are subscribed to event name
         self._event_handlers: Dict[str, List[_HandlerType]] = {}
         self._server_request_handlers: Dict[str, _HandlerType] = {}
@@ -117,37 +131,61 @@ class StellaClient(ipc.Client):
         if (error := data.get("error")) is not None:
             self.stop_reading_messages()
             raise Exception(f"Unable to get event from server: {error}")
+
+        if self.binary_framing:
+            await self.negotiate_framing()
         return data
 
+    async def negotiate_framing(self, *, timeout: float = 5) -> bool:
+        """Asks the server to switch this session to binary frames. The session stays on JSON as soon as the server
+           answers with anything else than the format, an error included, or when it doesn't answer in time. Only
+           enable binary_framing for servers that implement negotiate_framing, a server that ignores it costs the
+           whole timeout."""
+        self.codec = None
+        try:
+            data = await self.request("negotiate_framing", timeout=timeout, formats=[BINARY_FORMAT])
+        except asyncio.TimeoutError:
+            return False
+
+        if not isinstance(data, dict) or data.get("format") != BINARY_FORMAT or not data.get("session"):
+            return False
+
+        self.codec = BinaryCodec(data["session"])
+        return True
+
     async def request(self, endpoint: str, *, timeout: Optional[float] = None,
                       **data: Any) -> IPCData:
+        """Sends a request and waits for its response. timeout defaults to the endpoint's timeout in requests, 0
+           sends the request without waiting for anything."""
         await self.check_init()
 
         request_id = self._new_request_id()
-        listen = timeout != 0
-        future = None
-        if listen:
-            # register before sending message to avoid data race
-            future = self._register_callback(endpoint, request_id)
-        await self.websocket.send_json(
-            self._make_payload(endpoint=endpoint, data=data, request_id=request_id)
-        )
-
-        if listen:
-            return await asyncio.wait_for(future, timeout)
+        if timeout == 0:
+            await self._send(endpoint, request_id, data)
+            return
 
-    @staticmethod
-    def _new_request_id() -> str:
-        return os.urandom(32).hex()
+        # registered before sending message to avoid data race
+        async with self.requests.track(endpoint, request_id) as future:
+            await self._send(endpoint, request_id, data)
+            return await asyncio.wait_for(future, self.requests.timeout_for(endpoint, timeout))
 
-    def _register_callback(self, endpoint: str, request_id: str) -> asyncio.Future[IPCData]:
-        future = asyncio.get_event_loop().create_future()
-        callbacks = self._callbacks.setdefault(f"on_{endpoint}", {})
-        callbacks[request_id] = future
+    async def _respond(self, request_id: Optional[str], value: Any) -> None:
+        with contextlib.suppress(asyncio.TimeoutError):
+            await self.request("bot_response", request_id=request_id, data=value)
 
-        return future
+    def _new_request_id(self) -> Union[str, int]:
+        if self.codec is not None:
+            return self.codec.new_request_id()
+        return os.urandom(32).hex()
+
+    async def _send(self, endpoint: str, request_id: Union[str, int], data: Dict[str, Any]) -> None:
+        if self.codec is not None:
+            await self.websocket.send_bytes(self.codec.encode(endpoint, request_id, data))
+        else:
+            await self.websocket.send_json(self._make_payload(endpoint=endpoint, data=data, request_id=request_id))
 
-    def _make_payload(self, *, endpoint: str, data: Dict[str, Any], request_id: str) -> _SendMessagePayload:
+    def _make_payload(self, *, endpoint: str, data: Dict[str, Any],
+                      request_id: Union[str, int]) -> _SendMessagePayload:
         return {
             "endpoint": endpoint,
             "request_id": request_id,
@@ -165,6 +203,8 @@ class StellaClient(ipc.Client):
                 continue
             elif recv.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.CLOSE):
                 print("IPC websocket session closed, reconnecting...")
+                # the binary frames were agreed on for the closed session only
+                self.codec = None
                 await self.session.close()
                 await asyncio.sleep(5)
                 await self.init_sock()
@@ -175,7 +215,12 @@ class StellaClient(ipc.Client):
     async def _read_message_stream(self) -> None:
         async for ws_message in self._message_stream():
             try:
-                await self._process_message(ws_message.json())
+                # frames may arrive before negotiate_framing gets to set the codec, decoding doesn't need it
+                if ws_message.type == aiohttp.WSMsgType.BINARY:
+                    message = BinaryCodec.decode(ws_message.data)
+                else:
+                    message = ws_message.json()
+                await self._process_message(message)
             except Exception as e:
                 print_exception("Ignoring error in gateway:", e)
 
@@ -184,17 +229,13 @@ class StellaClient(ipc.Client):
         response = message["response"]
 
         if request_id := message.get("request_id"):
-            callbacks = self._callbacks.get(event, {})
-
-            if future := callbacks.pop(request_id, None):  # type: ignore[call-overload]
-                future.set_result(response)
-            else:
+            if not self.requests.resolve(event, request_id, response):
                 print(f"unregistered request id {request_id} for IPC event {event}, ignoring")
 
         if callback := self._server_request_handlers.get(event):
             value = await callback(response)
             request_id = response.get('listen_id')
-            asyncio.create_task(self.request("bot_response", request_id=request_id, data=value))
+            asyncio.create_task(self._respond(request_id, value))
             return
 
         if handlers := self._event_handlers.get(event):
@@ -211,11 +252,11 @@ class TokenPayload:
 class StellaFile:
     id: str
     name: str
-    byte: bytes
+    byte: Optional[bytes]
     created_at: datetime.datetime
 
     @classmethod
-    def from_api(cls, data: Dict[str, Any], byte) -> Self:
+    def from_api(cls, data: Dict[str, Any], byte: Optional[bytes]) -> Self:
         date_data = discord.utils.parse_time(data['created_at'])
         return cls(data['file_id'], data['file_name'], byte, date_data)
 
@@ -227,70 +268,233 @@ class StellaFile:
         return self.url
 
 
+@dataclass
+class UploadStats:
+    hits: int = 0
+    misses: int = 0
+    bytes_saved: int = 0
+    bytes_uploaded: int = 0
+
+    def __str__(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.
+        return f"{self.hits}/{total} deduplicated ({rate:.2%}), {self.bytes_saved:,} bytes saved, " \
+               f"{self.bytes_uploaded:,} bytes uploaded"
+
+
+FileKey = Tuple[bytes, str]
+
+
+class FileIndex:
+    """Content addressed index of uploaded files. Identical bytes with the same content type are uploaded once,
+       afterwards the StellaFile of the first upload is given back without a request. The index is kept in
+       stella_files, with the most recently used entries in memory."""
+    INSERT_QUERY = "INSERT INTO stella_files VALUES($1, $2, $3, $4, $5, $6) ON CONFLICT DO NOTHING"
+    SELECT_QUERY = "SELECT file_id, file_name, created_at FROM stella_files WHERE digest=$1 AND content_type=$2"
+
+    def __init__(self, bot, *, maxsize: int = 2048):
+        self.bot = bot
+        self.stats = UploadStats()
+        self.files: LRUCache[FileKey, StellaFile] = LRUCache(maxsize, name="uploads")
+        self._pending: Dict[FileKey, asyncio.Task[StellaFile]] = {}
+
+    @staticmethod
+    @in_executor()
+    def _file_digest(file: Union[memoryview, str, os.PathLike[str]]) -> Tuple[bytes, int]:
+        """Hashes a buffer or a file in chunks, returns the digest and the number of bytes. A buffer is released
+           once hashed."""
+        if isinstance(file, memoryview):
+            with file:
+                return hashlib.sha256(file).digest(), file.nbytes
+
+        digest = hashlib.sha256()
+        size = 0
+        with open(file, "rb") as reader:
+            while chunk := reader.read(2 ** 16):
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.digest(), size
+
+    async def key(self, file: Union[memoryview, str, os.PathLike[str]], filename: str) -> Tuple[FileKey, int]:
+        content_type, _ = mimetypes.guess_type(filename)
+        # a view of its own, the thread keeps hashing after a cancelled caller released theirs
+        digest, size = await self._file_digest(memoryview(file) if isinstance(file, memoryview) else file)
+        return (digest, content_type or ""), size
+
+    async def lookup(self, key: FileKey) -> Optional[StellaFile]:
+        if (found := self.files.get(key)) is not None:
+            return found
+
+        if self.bot.pool_pg is None or (record := await self.bot.pool_pg.fetchrow(self.SELECT_QUERY, *key)) is None:
+            return None
+        self.files[key] = found = StellaFile(record["file_id"], record["file_name"], None, record["created_at"])
+        return found
+
+    async def upload(self, file: Union[memoryview, str, os.PathLike[str]], filename: str,
+                     upload: Callable[[Union[memoryview, str, os.PathLike[str]]], Awaitable[StellaFile]], *,
+                     byte: Optional[bytes] = None) -> StellaFile:
+        """Returns the already uploaded file with the same content, or uploads it with upload. file is a memoryview
+           or a path, byte is what the returned StellaFile holds."""
+        key, size = await self.key(file, filename)
+        if (found := await self.lookup(key)) is None:
+            # concurrent uploads of the same content share the first one
+            if (task := self._pending.get(key)) is None:
+                # the shielded task outlives a cancelled caller, so it sends through its own view
+                source = memoryview(file) if isinstance(file, memoryview) else file
+                task = self._pending[key] = asyncio.create_task(self._upload(key, size, source, upload))
+                task.add_done_callback(lambda _: self._pending.pop(key, None))
+                return await asyncio.shield(task)
+            found = await asyncio.shield(task)
+
+        self.stats.hits += 1
+        self.stats.bytes_saved += size
+        return dataclasses.replace(found, byte=byte)
+
+    async def _upload(self, key: FileKey, size: int, source: Union[memoryview, str, os.PathLike[str]],
+                      upload: Callable[[Union[memoryview, str, os.PathLike[str]]], Awaitable[StellaFile]]
+                      ) -> StellaFile:
+        try:
+            stella_file = await upload(source)
+        finally:
+            if isinstance(source, memoryview):
+                source.release()
+        self.stats.misses += 1
+        self.stats.bytes_uploaded += size
+        self.files[key] = dataclasses.replace(stella_file, byte=None)
+        if self.bot.pool_pg is not None:
+            try:
+                await self.bot.pool_pg.execute(self.INSERT_QUERY, *key, stella_file.id, stella_file.name, size,
+                                               stella_file.created_at)
+            except Exception as e:
+                print_exception("Unable to store the uploaded file in stella_files:", e)
+        return stella_file
+
+
 class StellaAPI:
+    """Client of the Stella API. A single session with a pooled connector is kept for the life of the bot, the token
+       is sent per request so renewing it doesn't replace the session. Renewals are single flight and uploads wait
+       for one of max_uploads slots."""
     BASE = "http://api.interstella.online"
 
-    def __init__(self, bot):
+    def __init__(self, bot, *, base: Optional[str] = None, max_uploads: int = 4, limit_per_host: int = 8):
         self.bot = bot
+        self.base = base or self.BASE
         self.username = bot.user_db
         self.password = bot.pass_db
         self.http: Optional[aiohttp.ClientSession] = None
-        self.headers = None
         self.access_token = None
+        self.file_index = FileIndex(bot)
+        self.max_uploads = max_uploads
+        self.limit_per_host = limit_per_host
+        self.token_renewals = 0
+        self._token_task: Optional[asyncio.Task[TokenPayload]] = None
+        # created inside the running loop, python 3.8 binds the semaphore to the loop it's created in
+        self._upload_slots: Optional[asyncio.Semaphore] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} base={self.base!r} token_renewals={self.token_renewals}>"
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self.http is None or self.http.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, keepalive_timeout=60)
+            self.http = aiohttp.ClientSession(connector=connector)
+        return self.http
+
+    @property
+    def upload_slots(self) -> asyncio.Semaphore:
+        if self._upload_slots is None:
+            self._upload_slots = asyncio.Semaphore(self.max_uploads)
+        return self._upload_slots
 
-    async def generate_token(self):
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self.access_token is None:
+            return {}
+        return {'Authorization': f'Bearer {self.access_token}'}
+
+    async def generate_token(self, *, expired: Optional[str] = None) -> TokenPayload:
+        """Renews the token, concurrent callers wait for the same renewal. When expired is given and the token was
+           already renewed since, nothing is requested."""
+        if expired is not None and expired != self.access_token:
+            return TokenPayload(self.access_token, "bearer")
+
+        if self._token_task is None:
+            self._token_task = asyncio.create_task(self._generate_token())
+            self._token_task.add_done_callback(self._clear_token_task)
+        return await asyncio.shield(self._token_task)
+
+    def _clear_token_task(self, _: asyncio.Task[TokenPayload]) -> None:
+        self._token_task = None
+
+    async def _generate_token(self) -> TokenPayload:
         data = {
             "username": self.username,
             "password": self.password
         }
-        http = self.http or aiohttp.ClientSession()
-        async with http:
-            self.http = http
-            values = await self._request("POST", "/token", data=data)
+        values = await self._request("POST", "/token", data=data, authorize=False)
         token = TokenPayload(values.get("access_token"), values.get("token_type"))
-        headers = {
-            'Authorization': f'Bearer {token.access_token}'
-        }
-        self.http = aiohttp.ClientSession(headers=headers)
         self.access_token = token.access_token
+        self.token_renewals += 1
         return token
 
-    async def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
-        async with self.http.request(method, self.BASE + url, **kwargs) as resp:
+    async def _request(self, method: str, url: str, *, authorize: bool = True, **kwargs) -> Dict[str, Any]:
+        if authorize:
+            kwargs["headers"] = {**self.headers, **kwargs.get("headers", {})}
+        async with self.session.request(method, self.base + url, **kwargs) as resp:
             if resp.status == status.HTTP_401_UNAUTHORIZED:
                 raise TokenInvalid("Invalid token given.")
             if resp.content_type == "application/json":
                 return await resp.json()
             raise StellaAPIError(await resp.text())
 
-    async def upload_file(self, *, file: bytes, filename: str, retries=4) -> StellaFile:
-        async def callback():
-            try:
-                return await self._upload_file(file, filename)
-            except TokenInvalid:
-                await self.generate_token()
-                return await self._upload_file(file, filename)
-
-        return await except_retry(callback, retries=retries)
-
-    async def _upload_file(self, file: bytes, filename: str) -> StellaFile:
+    async def _authorized(self, callback: Callable[[], Awaitable[Any]]) -> Any:
+        """Calls callback again after renewing the token when it was rejected."""
+        token = self.access_token
+        try:
+            return await callback()
+        except TokenInvalid:
+            await self.generate_token(expired=token)
+            return await callback()
+
+    async def upload_file(self, *, file: UploadSource, filename: str, retries=4) -> StellaFile:
+        """Uploads file without copying it. Buffers are sent through a memoryview and paths are streamed in chunks,
+           the returned StellaFile only holds the bytes when bytes were given."""
+        byte = file if isinstance(file, bytes) else None
+        with contextlib.ExitStack() as stack:
+            if isinstance(file, io.BytesIO):
+                # the whole buffer regardless of the position, released before the BytesIO can be closed
+                file = stack.enter_context(file.getbuffer())
+            elif isinstance(file, (bytes, bytearray, memoryview)):
+                file = stack.enter_context(memoryview(file))
+
+            async def upload(source: Union[memoryview, str, os.PathLike[str]]) -> StellaFile:
+                callback = functools.partial(self._authorized, lambda: self._upload_file(source, filename, byte))
+                return await except_retry(callback, retries=retries)
+
+            return await self.file_index.upload(file, filename, upload, byte=byte)
+
+    async def _upload_file(self, file: Union[memoryview, str, os.PathLike[str]], filename: str,
+                           byte: Optional[bytes]) -> StellaFile:
         data = aiohttp.FormData()
         extension, _ = mimetypes.guess_type(filename)
-        data.add_field('file', io.BytesIO(file), filename=filename, content_type=extension)
-        data.add_field('name', filename)
+        with contextlib.ExitStack() as stack:
+            if not isinstance(file, memoryview):
+                # opened for every attempt, a retry can't reuse a consumed file
+                file = stack.enter_context(open(file, "rb"))
+            data.add_field('file', file, filename=filename, content_type=extension)
+            data.add_field('name', filename)
 
-        values = await self._request("POST", "/files/", data=data)
-        return StellaFile.from_api(values, file)
+            async with self.upload_slots:
+                values = await self._request("POST", "/files/", data=data)
+        return StellaFile.from_api(values, byte)
 
     async def is_nsfw(self, query: str):
-        return await self._request("POST", "/simple_nsfw_detection/", data={"query": query})
+        return await self._authorized(lambda: self._request("POST", "/simple_nsfw_detection/", data={"query": query}))
 
     async def execute_python(self, code: str):
-        return await self._request("POST", "/execute_python/", data={"code": code})
+        return await self._authorized(lambda: self._request("POST", "/execute_python/", data={"code": code}))
 
     async def close(self):
-        await self.http.close()
-
-
-
-
+        if self.http is not None:
+            await self.http.close()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import itertools
+import json
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+# version of the binary frames, sent in the negotiation so the server can refuse frames it doesn't know
+BINARY_FORMAT = "struct-v1"
+
+
+class BinaryCodec:
+    """Binary frames negotiated once per websocket session. The server knows who the client is from the handshake,
+       so unlike the JSON messages, frames carry no authorization headers and use integer request ids. A frame is
+
+           !I request id, 0 when no response is expected
+           !B length of the endpoint
+           endpoint in utf-8
+           the data, or response, as compact JSON
+    """
+    HEADER = struct.Struct("!IB")
+
+    def __init__(self, session: str):
+        self.session = session
+        self._ids = itertools.count(1)
+
+    def new_request_id(self) -> int:
+        # wraps around way after every request that could still be waiting is gone
+        return next(self._ids) % 0xFFFFFFFF + 1
+
+    def encode(self, endpoint: str, request_id: Optional[int], data: Dict[str, Any]) -> bytes:
+        name = endpoint.encode()
+        body = json.dumps(data, separators=(",", ":")).encode()
+        return self.HEADER.pack(request_id or 0, len(name)) + name + body
+
+    @classmethod
+    def decode(cls, frame: bytes) -> Dict[str, Any]:
+        """Decodes a frame sent by the server into the same shape as a JSON message."""
+        request_id, endpoint, body = split_frame(frame)
+        message = {"endpoint": endpoint, "response": json.loads(body)}
+        if request_id:
+            message["request_id"] = request_id
+        return message
+
+
+def split_frame(frame: bytes) -> Tuple[int, str, bytes]:
+    """Request id, endpoint and body of a binary frame, for servers that answer binary frames."""
+    request_id, length = BinaryCodec.HEADER.unpack_from(frame)
+    start = BinaryCodec.HEADER.size
+    return request_id, bytes(frame[start:start + length]).decode(), bytes(frame[start + length:])
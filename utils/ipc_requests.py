@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import time
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Union
+
+import numpy as np
+import tabulate
+
+
+@dataclasses.dataclass
+class EndpointStats:
+    in_flight: int = 0
+    completed: int = 0
+    timeouts: int = 0
+    cancelled: int = 0
+    latencies: Deque[float] = dataclasses.field(default_factory=lambda: collections.deque(maxlen=1024))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Round trip in seconds of the latest requests, None when nothing completed yet."""
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+
+class RequestManager:
+    """Keeps the futures of IPC requests that waits for a response. Every request has a timeout, the endpoint's
+       from timeouts or default_timeout, and its future is removed however the request ends. At most max_in_flight
+       requests waits for a response at once, the rest waits for a slot."""
+    def __init__(self, *, default_timeout: Optional[float] = 60, timeouts: Optional[Dict[str, Optional[float]]] = None,
+                 max_in_flight: int = 64):
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.max_in_flight = max_in_flight
+        self.stats: Dict[str, EndpointStats] = {}
+        # futures are subscribed to event name and request id, an int once the session uses binary frames
+        self._futures: Dict[str, Dict[Union[str, int], asyncio.Future[Any]]] = {}
+        # created inside the running loop, python 3.8 binds the semaphore to the loop it's created in
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def __len__(self) -> int:
+        return sum(map(len, self._futures.values()))
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self._slots
+
+    def timeout_for(self, endpoint: str, timeout: Optional[float] = None) -> Optional[float]:
+        if timeout is not None:
+            return timeout
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    @contextlib.asynccontextmanager
+    async def track(self, endpoint: str, request_id: Union[str, int]) -> AsyncIterator[asyncio.Future[Any]]:
+        """Registers a future for the response of request_id, the request must be sent inside the block."""
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        async with self.slots:
+            future = asyncio.get_running_loop().create_future()
+            futures = self._futures.setdefault(f"on_{endpoint}", {})
+            futures[request_id] = future
+            stats.in_flight += 1
+            start = time.perf_counter()
+            try:
+                yield future
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                raise
+            except asyncio.CancelledError:
+                stats.cancelled += 1
+                raise
+            else:
+                stats.completed += 1
+                stats.latencies.append(time.perf_counter() - start)
+            finally:
+                stats.in_flight -= 1
+                futures.pop(request_id, None)
+                if not futures:
+                    self._futures.pop(f"on_{endpoint}", None)
+
+    def resolve(self, event: str, request_id: Union[str, int], response: Any) -> bool:
+        """Sets the response of a request, returns False when nothing waits for it anymore."""
+        future = self._futures.get(event, {}).get(request_id)
+        if future is None or future.done():
+            return False
+        future.set_result(response)
+        return True
+
+    def table(self) -> str:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else value * 1e3
+
+        rows = [(endpoint, s.in_flight, s.completed, s.timeouts, s.cancelled, ms(s.percentile(50)),
+                 ms(s.percentile(99))) for endpoint, s in sorted(self.stats.items())]
+        headers = ["Endpoint", "In flight", "Completed", "Timeouts", "Cancelled", "p50 (ms)", "p99 (ms)"]
+        return tabulate.tabulate(rows, headers=headers, floatfmt=".1f", missingval="-")
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import dataclasses
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+import types
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import tabulate
+
+# Heavy third party modules (tensorflow, matplotlib, scipy) are wrapped here so they are only imported the first time
+# anything touches them, instead of blocking the bot startup before the gateway connection.
+
+log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class ImportRecord:
+    name: str
+    seconds: float
+    modules: int
+    reason: str
+
+
+class ImportReport:
+    """Records how long each lazy module took to import, and how many modules it pulled into sys.modules."""
+    def __init__(self):
+        self.records: Dict[str, ImportRecord] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, record: ImportRecord) -> None:
+        self.records[record.name] = record
+        log.info("Imported %s in %.3fs (%s modules, %s)", record.name, record.seconds, record.modules, record.reason)
+
+    def table(self) -> str:
+        rows = [(r.name, r.seconds, r.modules, r.reason)
+                for r in sorted(self.records.values(), key=lambda r: r.seconds, reverse=True)]
+        pending = [(name, None, None, "not imported") for name in _lazy_modules if name not in self.records]
+        headers = ["Module", "Seconds", "Modules loaded", "Reason"]
+        return tabulate.tabulate(rows + pending, headers=headers, floatfmt=".3f", missingval="-")
+
+    def __str__(self) -> str:
+        return self.table()
+
+
+import_report = ImportReport()
+_lazy_modules: Dict[str, LazyModule] = {}
+
+
+class LazyModule(types.ModuleType):
+    """Stand in for a module that imports the real module on the first attribute access."""
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self, reason: str = "first use") -> types.ModuleType:
+        if (module := self.__dict__["_lazy_module"]) is not None:
+            return module
+
+        with self.__dict__["_lazy_lock"]:
+            if (module := self.__dict__["_lazy_module"]) is None:
+                already = self.__name__ in sys.modules
+                before = len(sys.modules)
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                if not already:
+                    import_report.add(ImportRecord(self.__name__, time.perf_counter() - start,
+                                                   len(sys.modules) - before, reason))
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._load(), item)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<{self.__class__.__name__} {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Returns a lazy module for name, the same object is returned for the same name."""
+    if (module := _lazy_modules.get(name)) is None:
+        _lazy_modules[name] = module = LazyModule(name)
+    return module
+
+
+def _reset_locks() -> None:
+    # a forked process only has the thread that forked, a lock held by another thread would never be released
+    for module in _lazy_modules.values():
+        module.__dict__["_lazy_lock"] = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_locks)
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> ImportReport:
+    """Imports every lazy module given, or every lazy module that was registered. This blocks, so it should be ran
+       inside an executor."""
+    for name in ([*_lazy_modules] if names is None else names):
+        lazy_import(name)._load(reason="warm up")
+    return import_report
@@ -87,45 +87,112 @@ class BotData:
     @classmethod
     async def convert(cls, ctx: StellaContext, argument: str) -> Tuple[discord.Member, Any]:
         member = await IsBot().convert(ctx, argument)
+        return member, await cls.fetch_data(ctx, member)
+
+    @classmethod
+    async def fetch_data(cls, ctx: StellaContext, member: discord.Member) -> Any:
         table = cls.__name__.replace("Bot", "").lower()
         query = f"SELECT * FROM {table}_list WHERE guild_id=$1 AND bot_id=$2"
         if data := await ctx.bot.pool_pg.fetch(query, ctx.guild.id, member.id):
-            return member, data
+            return data
         raise NotInDatabase(member)
 
     def __int__(self) -> int:
         return self.bot.id
 
 
+class PrefixPrediction:
+    """Prefix and aliases of a bot from the Neural Network output. It's computed once so it can be cached in
+       StellaBot.prefix_predictions until prefixes_list is written for that bot."""
+    __slots__ = ("predicted_data", "prefix", "aliases")
+
+    def __init__(self, predicted_data: np.array):
+        scores = predicted_data[:, 3].astype(np.float64)
+        self.predicted_data = predicted_data
+        self.prefix = str(predicted_data[scores.argmax()][0])
+        potential = predicted_data[scores >= 50]
+        self.aliases = tuple(potential[potential[:, 0] != self.prefix][:, 0].tolist())
+
+
 class BotPrefixes(BotData):
     """Bot data for prefix"""
-    __slots__ = ("predicted_data", )
+    __slots__ = ("prediction", )
 
-    def __init__(self, member: discord.Member, predicted_data: dict):
+    def __init__(self, member: discord.Member, prediction: PrefixPrediction):
         super().__init__(member)
-        self.predicted_data = predicted_data
+        self.prediction = prediction
 
     @classmethod
     async def convert(cls, ctx: StellaContext, argument: str) -> BotPrefixes:
-        member, data = await super().convert(ctx, argument)
-        return await cls.from_db(ctx, member, data)
+        member = await IsBot().convert(ctx, argument)
+        if (prediction := ctx.bot.prefix_predictions.get((ctx.guild.id, member.id))) is not None:
+            return cls(member, prediction)
+
+        generation = ctx.bot.prefix_predictions.generation((ctx.guild.id, member.id))
+        data = await cls.fetch_data(ctx, member)
+        return await cls.from_db(ctx, member, data, generation=generation)
 
     @classmethod
-    async def from_db(cls, ctx: StellaContext, member, data) -> BotPrefixes:
+    async def from_db(cls, ctx: StellaContext, member, data, *, generation: Optional[int] = None) -> BotPrefixes:
         processed = [[x["prefix"], x["usage"], x["last_usage"].timestamp()] for x in data]
-        prediction = await ctx.bot.get_prefixes_dataset(processed)
+        prediction = PrefixPrediction(await ctx.bot.get_prefixes_dataset(processed))
+        ctx.bot.prefix_predictions.set((ctx.guild.id, member.id), prediction, generation=generation)
         return cls(member, prediction)
 
+    @classmethod
+    async def from_guild(cls, ctx: StellaContext, bot_ids: Optional[List[int]] = None) -> Dict[int, BotPrefixes]:
+        """Predicts the prefixes of every bot in the guild, or only bot_ids, with a single query and a single Neural
+           Network call. Cached predictions are reused when bot_ids is given. Bots that are no longer in the guild
+           are skipped."""
+        cache = ctx.bot.prefix_predictions
+        result = {}
+        query = "SELECT bot_id, prefix, usage, last_usage FROM prefixes_list WHERE guild_id=$1"
+        args = [ctx.guild.id]
+        if bot_ids is None:
+            candidates = [member.id for member in ctx.guild.members if member.bot]
+        else:
+            missing = []
+            for bot_id in bot_ids:
+                if (member := ctx.guild.get_member(bot_id)) is None:
+                    continue
+                if (prediction := cache.get((ctx.guild.id, bot_id))) is not None:
+                    result[bot_id] = cls(member, prediction)
+                else:
+                    missing.append(bot_id)
+
+            if not missing:
+                return result
+            query += " AND bot_id=ANY($2::BIGINT[])"
+            args.append(missing)
+            candidates = missing
+
+        generations = {bot_id: cache.generation((ctx.guild.id, bot_id)) for bot_id in candidates}
+        data = await ctx.bot.pool_pg.fetch(query, *args)
+        members = {}
+        for bot_id in {x["bot_id"] for x in data}:
+            if (member := ctx.guild.get_member(bot_id)) is not None:
+                members[bot_id] = member
+
+        processed = [[x["bot_id"], x["prefix"], x["usage"], x["last_usage"].timestamp()]
+                     for x in data if x["bot_id"] in members]
+        for bot_id, predicted in (await ctx.bot.get_guild_prefixes_dataset(processed)).items():
+            prediction = PrefixPrediction(predicted)
+            # a bot that joined during the query has no generation read, its prediction is not cached
+            cache.set((ctx.guild.id, bot_id), prediction, generation=generations.get(bot_id, -1))
+            result[bot_id] = cls(members[bot_id], prediction)
+        return result
+
+    @property
+    def predicted_data(self) -> np.array:
+        return self.prediction.predicted_data
+
     @property
     def prefix(self) -> str:
-        return str(self.predicted_data[self.predicted_data[:, 3].astype(np.float).argmax()][0])
+        return self.prediction.prefix
 
     @property
-    def aliases(self) -> str:
-        prefixes = self.predicted_data
-        potential = prefixes[prefixes[:, 3].astype(np.float) >= 50]
-        alias = potential[potential[:, 0] != self.prefix]
-        return alias[:, 0].tolist()
+    def aliases(self) -> List[str]:
+        return [*self.prediction.aliases]
 
     @property
     def all_raw_prefixes(self):
@@ -138,28 +205,28 @@ class BotPrefixes(BotData):
 
 class BotCommands(BotData):
     """Bot data for command counts"""
-    __slots__ = ("_commands", "total_usage", "command_usages")
+    __slots__ = ("_commands", "total_usage")
 
-    def __init__(self, member: discord.Member, commands: dict, command_usages: dict, total_usage: int):
+    def __init__(self, member: discord.Member, commands: dict, total_usage: int):
         super().__init__(member)
         self._commands = commands
-        self.command_usages = command_usages
         self.total_usage = total_usage
 
     @classmethod
     async def convert(cls, ctx: StellaContext, argument: str) -> BotCommands:
         member, data = await super().convert(ctx, argument)
-        command_usages = {}
-        for payload in data:
-            command = command_usages.setdefault(payload["command"], [])
-            command.append(payload["time_used"])
-
-        for command in command_usages.values():
-            command.sort(reverse=True)
-
-        commands = Counter(payload["command"] for payload in data)
+        commands = Counter({payload["command"]: payload["usage"] for payload in data})
         total_usage = sum(v for v in commands.values())
-        return cls(member, commands, command_usages, total_usage)
+        return cls(member, commands, total_usage)
+
+    @classmethod
+    async def fetch_data(cls, ctx: StellaContext, member: discord.Member) -> Any:
+        query = "SELECT command, SUM(usage) AS usage FROM commands_rollup " \
+                "WHERE guild_id=$1 AND bot_id=$2 " \
+                "GROUP BY command"
+        if data := await ctx.bot.pool_pg.fetch(query, ctx.guild.id, member.id):
+            return data
+        raise NotInDatabase(member)
 
     def get_command(self, command: str) -> str:
         return self._commands.get(command)
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import abc
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from utils.decorators import in_executor
+
+# Neural networks in here only needs numpy, keep tensorflow/keras imports in utils.prefix_ai.
+
+
+class PrefixNeuralNetwork:
+    """This Neural Network contains 2x1 input neuron, 1x3 hidden neuron, 1x1 output neuron"""
+    def __init__(self, x: Optional[np.array] = None, y: Optional[np.array] = None, weight1: Optional[np.array] = None,
+                 weight2: Optional[np.array] = None):
+        """When trainable is False, it is unable to train. This NN is supervised learning rather than unsupervised."""
+        trainable = True
+        if x is None:
+            trainable = False
+
+        self.input = x
+        if weight1 is None:
+            weight1 = np.random.rand(self.input.shape[1], 3)
+
+        if weight2 is None:
+            weight2 = np.random.rand(3, 1)
+
+        self.weights1 = weight1
+        self.weights2 = weight2
+
+        if trainable:
+            self.y = y
+            self.output = np.zeros(y.shape)
+
+        self.layer1 = None
+        self.layer2 = None
+
+    @staticmethod
+    def sigmoid_activation(x):
+        """Using sigmoid as activation function. This is to describe the uncertainty of a prefix usage vs time
+           relationship."""
+        return 1.0 / (1 + np.exp(-x))
+
+    @classmethod
+    def from_weight(cls, weight1: np.array, weight2: np.array) -> PrefixNeuralNetwork:
+        """This create an empty NeuralNetwork that cannot learn."""
+        return cls(weight1=np.array(weight1), weight2=np.array(weight2))
+
+    def calc_layer(self, layer, weight) -> np.array[float]:
+        """Get the dot product and use sigmoid as activation function"""
+        return self.sigmoid_activation(np.dot(layer, weight))
+
+    def feedforward(self) -> None:
+        """Calculate all layers"""
+        self.layer1 = self.calc_layer(self.input, self.weights1)
+        self.output = self.calc_layer(self.layer1, self.weights2)
+
+    def backprop(self) -> None:  # Wrote docstring so i remember
+        """Backprogration that uses chain rule.
+            dy = σ'(w2 * σ'(w1 * x))
+
+            All equation is in this photo, just in case i forgot lol
+            https://miro.medium.com/max/700/1*7zxb2lfWWKaVxnmq2o69Mw.png
+        """
+        def times_derivative(left_side, layer):
+            """Sigmoid derivative is for the weight calculation in backpropegration."""
+            return left_side * (layer * (1.0 - layer))
+
+        chain1 = times_derivative(2 * (self.y - self.output), self.output)
+        d_weights2 = self.layer1.T @ chain1
+
+        chain2 = times_derivative(chain1 @ self.weights2.T, self.layer1)
+        d_weights1 = self.input.T @ chain2
+
+        self.weights1 += d_weights1
+        self.weights2 += d_weights2
+
+    def train(self, epoch: Optional[int] = 100) -> None:
+        """Self explanatory"""
+        for e in range(epoch):
+            self.feedforward()
+            self.backprop()
+            print("Epoch:", e)
+
+    def fit(self, x: np.array) -> np.array[float]:
+        """Gets the prediction for each input passed in numpy.array where element
+           1st: prefix usage amount
+           2nd: prefix last usage time
+        """
+        layer1 = self.calc_layer(x, self.weights1)
+        result = self.calc_layer(layer1, self.weights2)
+        return result
+
+
+class BaseDerivativeNeuralNetwork(abc.ABC):
+    """Handles the input and output of the derivative prefix neural network, subclasses does the forward pass."""
+    input_output_size: int = 30
+
+    @abc.abstractmethod
+    def forward(self, x: np.array) -> np.array:
+        """Returns the sigmoid output of every row of x."""
+
+    @in_executor()
+    def predict(self, raw_data: Dict[str, Union[float, int, str]], *,
+                return_raw: Optional[bool] = False) -> Union[str, Tuple[str, List[Tuple[str, float]]]]:
+        evaluated, = self.predict_all([raw_data], return_raw=return_raw)
+        return evaluated
+
+    @in_executor()
+    def predict_many(self, raw_datas: List[Dict[str, Union[float, int, str]]], *,
+                     return_raw: Optional[bool] = False) -> List[Union[str, Tuple[str, List[Tuple[str, float]]]]]:
+        """Predicts every raw data in a single batch."""
+        return self.predict_all(raw_datas, return_raw=return_raw)
+
+    def predict_all(self, raw_datas: List[Dict[str, Union[float, int, str]]], *,
+                    return_raw: Optional[bool] = False) -> List[Union[str, Tuple[str, List[Tuple[str, float]]]]]:
+        processed = [self.process_input([(d["letter"], d["position"], d["percentage"]) for d in raw_data])
+                     for raw_data in raw_datas]
+        outputs = self.forward(np.vstack([x for x, _ in processed]))
+        results = []
+        for (_, original), output in zip(processed, outputs):
+            best = output[output >= 0.5]
+            evaluated = "".join(letter for letter, _ in original[:len(best)])
+            if return_raw:
+                evaluated = evaluated, [(letter, prediction) for (letter, _), prediction in zip(original, output)]
+            results.append(evaluated)
+        return results
+
+    def process_input(self, letters: List[Tuple[str, int, float]]) -> Tuple[np.array, Tuple[str, float]]:
+        input_layout = [("", 0)] * self.input_output_size
+        for prefix, postion, value in letters:
+            input_layout[postion] = (prefix, value)
+        return np.array([[t[1] for t in input_layout]]), input_layout
+
+
+class NumpyDerivativeNeuralNetwork(BaseDerivativeNeuralNetwork):
+    """DerivativeNeuralNetwork forward pass done in numpy, using the weights from
+       DerivativeNeuralNetwork.export_weights. A single row takes microseconds here, so it does not bother with the
+       executor."""
+    EPSILON = 1e-7  # keras backend epsilon, used by the Normalization layer
+
+    def __init__(self, path: str):
+        with np.load(path) as data:
+            self.mean = data["mean"]
+            self.std = np.maximum(np.sqrt(data["variance"]), self.EPSILON)
+            self.layers = [(data[f"kernel_{i}"], data[f"bias_{i}"]) for i in range(len(data.files) // 2 - 1)]
+        self.input_output_size = self.layers[-1][1].shape[0]
+
+    def forward(self, x: np.array) -> np.array:
+        *hidden, (kernel, bias) = self.layers
+        layer = (x - self.mean) / self.std
+        for hidden_kernel, hidden_bias in hidden:
+            layer = np.maximum(layer @ hidden_kernel + hidden_bias, 0)
+        return 1.0 / (1 + np.exp(-(layer @ kernel + bias)))
+
+    async def predict(self, raw_data: Dict[str, Union[float, int, str]], *,
+                      return_raw: Optional[bool] = False) -> Union[str, Tuple[str, List[Tuple[str, float]]]]:
+        evaluated, = self.predict_all([raw_data], return_raw=return_raw)
+        return evaluated
+
+    async def predict_many(self, raw_datas: List[Dict[str, Union[float, int, str]]], *,
+                           return_raw: Optional[bool] = False) -> List[Union[str, Tuple[str, List[Tuple[str, float]]]]]:
+        return self.predict_all(raw_datas, return_raw=return_raw)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import functools
+import multiprocessing
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+import tabulate
+
+from utils.errors import RenderFarmBusy
+from utils.render_worker import init_worker, timed
+
+
+@dataclasses.dataclass
+class RenderStats:
+    jobs: int = 0
+    rejected: int = 0
+    failures: int = 0
+    render_time: float = 0
+    wait_time: float = 0
+    max_time: float = 0
+
+    def add(self, render: float, total: float) -> None:
+        self.jobs += 1
+        self.render_time += render
+        self.wait_time += total - render
+        self.max_time = max(self.max_time, total)
+
+
+class RenderFarm:
+    """Renders matplotlib charts in a small pool of processes, pyplot keeps global state and holds the GIL for most
+       of a render, so doing it in the bot's thread executor stalls every other executor job.
+
+       Jobs must be top level functions that takes plain data and returns PNG bytes. When max_queue jobs are already
+       waiting, new jobs are rejected with RenderFarmBusy instead of piling up."""
+    def __init__(self, *, workers: int = 2, max_queue: int = 8):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.stats: Dict[str, RenderStats] = {}
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} workers={self.workers} pending={self.pending}/{self.max_queue}>"
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            # the bot runs threads (gateway, executor, asyncpg), forking it could copy a lock held by one of them.
+            # Workers import main.py without running it, see create_bot
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            context = multiprocessing.get_context(method)
+            self._pool = concurrent.futures.ProcessPoolExecutor(self.workers, mp_context=context,
+                                                                initializer=init_worker)
+        return self._pool
+
+    async def render(self, func: Callable[..., bytes], *args: Any, **kwargs: Any) -> bytes:
+        stats = self.stats.setdefault(func.__name__, RenderStats())
+        if self.pending >= self.max_queue:
+            stats.rejected += 1
+            raise RenderFarmBusy()
+
+        self.pending += 1
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        call = functools.partial(timed, func, *args, **kwargs)
+        try:
+            pool = self.pool
+            try:
+                value, render_time = await loop.run_in_executor(pool, call)
+            except BrokenProcessPool:
+                # a worker died, the pool is unusable from now on, start a new one and retry once. Jobs of the same
+                # pool fail together, only the first one replaces it
+                if self._pool is pool:
+                    self.shutdown()
+                value, render_time = await loop.run_in_executor(self.pool, call)
+        except Exception:
+            stats.failures += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        stats.add(render_time, time.perf_counter() - start)
+        return value
+
+    def table(self) -> str:
+        rows = [(name, s.jobs, s.rejected, s.failures, s.render_time / (s.jobs or 1) * 1e3,
+                 s.wait_time / (s.jobs or 1) * 1e3, s.max_time * 1e3) for name, s in self.stats.items()]
+        headers = ["Chart", "Jobs", "Rejected", "Failures", "Avg render (ms)", "Avg wait (ms)", "Max (ms)"]
+        return tabulate.tabulate(rows, headers=headers, floatfmt=".1f")
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Tuple
+
+# Runs inside the render farm processes. Workers are started with forkserver or spawn, so this module and the
+# module of every job are imported fresh in the worker, keep the imports here light.
+
+
+def init_worker() -> None:
+    """Imports matplotlib with the Agg backend once per worker, so the first chart doesn't pay for it."""
+    import matplotlib
+    matplotlib.use("Agg")
+    # warm up imports, charts use both through utils.lazy_import
+    import matplotlib.pyplot  # noqa: F401
+    import scipy.interpolate  # noqa: F401
+
+
+def timed(func: Callable[..., bytes], *args: Any, **kwargs: Any) -> Tuple[bytes, float]:
+    start = time.perf_counter()
+    return func(*args, **kwargs), time.perf_counter() - start
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def to_epoch_array(times: Iterable[datetime.datetime]) -> np.ndarray:
+    """Converts datetimes into an int64 array of microseconds since epoch. Naive datetimes are taken as UTC, which is
+       what the database returns for TIMESTAMP columns."""
+    naive = [t if t.tzinfo is None else t.astimezone(datetime.timezone.utc).replace(tzinfo=None) for t in times]
+    return np.array(naive, dtype="datetime64[us]").astype(np.int64)
+
+
+def bin_times(times: Sequence[datetime.datetime], start: datetime.datetime, end: datetime.datetime, *,
+              bins: int = 10, weights: Optional[Sequence[int]] = None) -> Tuple[List[datetime.datetime], List[int]]:
+    """Counts how many times falls into each of the equal windows between start and end, in a single pass.
+       When weights is given, each time counts as its weight instead of 1, for rows that are already aggregated.
+
+       Windows are returned from the most recent to the oldest and keyed by the start of the window, which is the
+       order create_graph expects."""
+    edges = np.linspace(*to_epoch_array((start, end)), bins + 1).astype(np.int64)
+    counts, _ = np.histogram(to_epoch_array(times), bins=edges, weights=weights)
+    starts = edges[:-1].astype("datetime64[us]").astype(datetime.datetime)
+    if start.tzinfo is not None:
+        starts = [s.replace(tzinfo=datetime.timezone.utc) for s in starts]
+    return [*reversed(starts)], [*reversed(counts.astype(np.int64).tolist())]
+
+
+def align_bins(start: datetime.datetime, end: datetime.datetime, bins: int,
+               step: datetime.timedelta) -> Tuple[datetime.datetime, datetime.datetime, int]:
+    """For times that are already bucketed every step, eg the hours of commands_rollup. Moves start back to the
+       start of its bucket and makes every window a whole number of buckets, so no bucket falls before the first
+       window and no window is left without a bucket. Fewer bins are returned when there are fewer buckets than
+       bins, end may move forward to close the last window."""
+    step_us = step // datetime.timedelta(microseconds=1)
+    start_us, end_us = to_epoch_array((start, end)).tolist()
+    start = start - datetime.timedelta(microseconds=start_us % step_us)
+    buckets = max(-(-(end_us - start_us + start_us % step_us) // step_us), 1)
+    per_bin = -(-buckets // max(bins, 1))
+    bins = -(-buckets // per_bin)
+    return start, start + step * per_bin * bins, bins
@@ -22,7 +22,7 @@ from discord.ext import commands
 from discord.utils import maybe_coroutine
 
 from utils.context_managers import BreakableTyping
-from utils.decorators import in_executor, pages
+from utils.decorators import pages
 
 # TODO: do some detail documentation, cause im lazy
 
@@ -94,6 +94,21 @@ freeing = lib.free_result
 multi_find_prefix.restype = ctypes.c_void_p
 find_commands = lib.find_commands
 find_commands.restype = ctypes.c_void_p
+compile_trie = lib.compile_trie
+compile_trie.restype = ctypes.c_void_p
+compile_trie.argtypes = [ctypes.POINTER(ctypes.c_char_p), ctypes.c_int]
+trie_find_prefix = lib.trie_find_prefix
+trie_find_prefix.restype = ctypes.c_void_p
+trie_find_prefix.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+trie_find_suffix = lib.trie_find_suffix
+trie_find_suffix.restype = ctypes.c_void_p
+trie_find_suffix.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+trie_insert = lib.trie_insert
+trie_insert.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+trie_remove = lib.trie_remove
+trie_remove.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+free_trie = lib.free_trie
+free_trie.argtypes = [ctypes.c_void_p]
 
 
 class RESULT(ctypes.Structure):
@@ -117,6 +132,56 @@ def decode_result(return_result: int, /) -> List[Any]:
     return to_return
 
 
+class PrefixTrie:
+    """Trie made by C code, it finds every known prefix that a message starts with in a single pass over the
+       message instead of a binary search for each length of the message. Words can be inserted and removed
+       without rebuilding the trie."""
+    def __init__(self, string_list: Iterable[str] = (), /):
+        encoded = [*{self.encode(x) for x in string_list}]
+        self.size = len(encoded)
+        self.pointer = compile_trie((ctypes.c_char_p * self.size)(*encoded), self.size)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __del__(self) -> None:
+        if pointer := getattr(self, "pointer", None):
+            free_trie(pointer)
+            self.pointer = None
+
+    @staticmethod
+    def encode(word: str, /) -> bytes:
+        return word.encode("utf-8")
+
+    def insert(self, word: str, /) -> bool:
+        """Inserts a word, returns False if it was already in the trie."""
+        inserted = bool(trie_insert(self.pointer, self.encode(word)))
+        self.size += inserted
+        return inserted
+
+    def remove(self, word: str, /) -> bool:
+        """Removes a word, returns False if it was not in the trie."""
+        removed = bool(trie_remove(self.pointer, self.encode(word)))
+        self.size -= removed
+        return removed
+
+    def search(self, content_buffer: ctypes.c_char_p, /) -> List[str]:
+        """Gets every prefix that content starts with, longest prefix comes first."""
+        return decode_result(trie_find_prefix(self.pointer, content_buffer))
+
+
+class SuffixTrie(PrefixTrie):
+    """Same as PrefixTrie except words are stored reversed, to find the commands that each word of a message ends
+       with like find_commands does."""
+    @staticmethod
+    def encode(word: str, /) -> bytes:
+        return word.encode("utf-8")[::-1]
+
+    def search(self, content_buffer: ctypes.c_char_p, /) -> List[str]:
+        """Gets every command that a word in content ends with, longest command of each word comes first."""
+        return decode_result(trie_find_suffix(self.pointer, content_buffer))
+
+
 def actually_calls(param: Tuple[Any, Any], callback: Callable[[Any, Any, Any], int], /) -> Optional[List[Any]]:
     """Handles C functions and return value."""
     array_stuff, content_buffer = param
@@ -127,15 +192,21 @@ def actually_calls(param: Tuple[Any, Any], callback: Callable[[Any, Any, Any], i
         return decode_result(return_result)
 
 
-@in_executor()
+# Tries are modified in place, these must not run in an executor while the event loop inserts into them.
+# It is only a single walk over the message so it is fine to block for it.
 def search_prefixes(*args: Any) -> List[Any]:
-    """Pass multi_find_prefix function from C."""
+    """Pass trie_find_prefix function from C when given a PrefixTrie, otherwise multi_find_prefix."""
+    compiled, content_buffer = args
+    if isinstance(compiled, PrefixTrie):
+        return compiled.search(content_buffer)
     return actually_calls(args, multi_find_prefix)
 
 
-@in_executor()
 def search_commands(*args: Any) -> List[Any]:
-    """Pass find_commands function from C."""
+    """Pass trie_find_suffix function from C when given a SuffixTrie, otherwise find_commands."""
+    compiled, content_buffer = args
+    if isinstance(compiled, SuffixTrie):
+        return compiled.search(content_buffer)
     return actually_calls(args, find_commands)
 
 